@@ -0,0 +1,238 @@
+import ast
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from typing import List, Sequence
+
+
+# Risk profiles the advice schema lets the model choose from.
+RISK_PROFILES = ("conservative", "moderately conservative", "balanced", "moderately aggressive", "aggressive")
+NO_INFO = "No info yet"
+
+
+class AllocationParseError(ValueError):
+    """The model output holds no usable allocation."""
+
+
+@dataclass
+class ParsedAllocation:
+    weights: List[float]                       # one per universe entry, summing to 1
+    repairs: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Advice:
+    allocation: ParsedAllocation
+    summary: str
+    risk_profile: str
+    goal: str
+
+
+_START = re.compile(r"[\[{]")
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_PAIR = re.compile(r'"([^"]+)"\s*:\s*(' + _NUMBER.pattern + ")")
+_decoder = json.JSONDecoder()
+
+
+def _closing(text: str, start: int) -> int:
+    """Index just past the bracket matching ``text[start]``, or len(text) if unbalanced."""
+    opening = text[start]
+    closing = "]" if opening == "[" else "}"
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == opening:
+            depth += 1
+        elif text[i] == closing:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return len(text)
+
+
+def _is_percent(value) -> bool:
+    return isinstance(value, str) and value.strip().endswith("%")
+
+
+def _to_float(value) -> float:
+    """A weight as a number; a string with an explicit "%" is scaled to a fraction."""
+    number = float(value.strip().rstrip("%")) if isinstance(value, str) else float(value)
+    if not math.isfinite(number):
+        raise ValueError(value)
+    return number / 100 if _is_percent(value) else number
+
+
+def _too_short(length: int, n: int) -> bool:
+    """An array missing more than one trailing weight is not a positional allocation (e.g. a citation)."""
+    return length < n - 1
+
+
+def _extract(text: str, n: int):
+    """
+    First JSON/Python object of numbers, or array of numbers not too short for
+    an ``n``-asset allocation, in ``text`` (fences and prose ignored).
+    """
+    for match in _START.finditer(text):
+        start = match.start()
+        try:
+            value, _ = _decoder.raw_decode(text, start)
+        except ValueError:
+            snippet = text[start:_closing(text, start)]
+            try:
+                value = ast.literal_eval(snippet)
+            except (ValueError, SyntaxError):
+                # Last resort (e.g. a truncated reply): every number, or every "name": number pair.
+                if text[start] == "[":
+                    value = [float(number) for number in _NUMBER.findall(snippet)]
+                else:
+                    value = {name: float(number) for name, number in _PAIR.findall(snippet)}
+        if isinstance(value, (list, tuple)) and value and not _too_short(len(value), n):
+            value = list(value)
+        elif isinstance(value, dict) and value:
+            value = {str(k): v for k, v in value.items()}
+        else:
+            continue
+        # Returned as decoded, so repair_allocation can report percentage strings.
+        try:
+            for weight in value.values() if isinstance(value, dict) else value:
+                _to_float(weight)
+        except (TypeError, ValueError):
+            continue
+        return value
+    raise AllocationParseError("No numeric array or object found in the model output")
+
+
+def _normalise_key(key: str) -> str:
+    return re.sub(r"\s+", " ", key).strip().casefold()
+
+
+def parse_allocation(text: str, labels: Sequence[str], tickers: Sequence[str] = ()) -> ParsedAllocation:
+    """
+    Parse and repair an allocation returned by the LLM.
+
+    Takes the first numeric object (mapped by label or ticker,
+    case-insensitive; a ticker listed twice maps to its first entry) or array
+    (mapped by position; arrays missing more than one weight are skipped).
+    Missing entries are zero, percentages are scaled to fractions,
+    negatives are clipped and the weights are renormalised to sum to 1.
+    Every such fix is reported in ``repairs``.
+
+    Args:
+        text (str): Raw model output.
+        labels (Sequence[str]): Universe labels, in order.
+        tickers (Sequence[str]): Optional tickers aligned with ``labels``.
+
+    Raises:
+        AllocationParseError: No allocation could be extracted, or no weight is positive.
+    """
+    return repair_allocation(_extract(text, len(labels)), labels, tickers)
+
+
+def repair_allocation(value, labels: Sequence[str], tickers: Sequence[str] = ()) -> ParsedAllocation:
+    """``parse_allocation`` for an already decoded list of weights or name -> weight dict."""
+    n = len(labels)
+    repairs = []
+    try:
+        percents = sum(_is_percent(v) for v in (value.values() if isinstance(value, dict) else value))
+        if isinstance(value, dict):
+            value = {str(k): _to_float(v) for k, v in value.items()}
+        else:
+            value = [_to_float(v) for v in value]
+    except (TypeError, ValueError) as e:
+        raise AllocationParseError(f"Non-numeric weight: {e}")
+    if percents:
+        repairs.append(f"converted {percents} percentage strings to fractions")
+
+    if isinstance(value, dict):
+        index = {}
+        for i, name in enumerate(list(labels) + list(tickers)):
+            index.setdefault(_normalise_key(name), i % n)
+        weights = [0.0] * n
+        for key, weight in value.items():
+            i = index.get(_normalise_key(key))
+            if i is None:
+                repairs.append(f"ignored unknown asset '{key}'")
+                continue
+            weights[i] += weight
+        missing = n - len({index[_normalise_key(k)] for k in value if _normalise_key(k) in index})
+        if missing:
+            repairs.append(f"set {missing} unlisted assets to 0")
+    else:
+        weights = list(value)
+        if _too_short(len(weights), n):
+            raise AllocationParseError(f"Only {len(weights)} positional weights for {n} assets")
+        if len(weights) < n:
+            repairs.append("padded the missing trailing weight with 0")
+            weights += [0.0] * (n - len(weights))
+        elif len(weights) > n:
+            repairs.append(f"dropped {len(weights) - n} extra weights")
+            weights = weights[:n]
+
+    negatives = sum(w < 0 for w in weights)
+    if negatives:
+        repairs.append(f"clipped {negatives} negative weights to 0")
+        weights = [max(w, 0.0) for w in weights]
+
+    total = sum(weights)
+    if total <= 0:
+        raise AllocationParseError("The allocation has no positive weight")
+    if 90 <= total <= 110:
+        repairs.append("converted percentages to fractions")
+        weights = [w / 100 for w in weights]
+        total /= 100
+    if abs(total - 1) > 1e-6:
+        repairs.append(f"renormalised weights summing to {total:.4g}")
+    weights = [w / total for w in weights]
+    return ParsedAllocation(weights=weights, repairs=repairs)
+
+
+def advice_schema(labels: Sequence[str]) -> dict:
+    """
+    Response schema of the allocation call: client summary, risk profile,
+    goal and one weight per label, in the subset of JSON Schema Gemini accepts.
+    """
+    labels = list(dict.fromkeys(labels))
+    return {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string"},
+            "risk_profile": {"type": "string", "enum": list(RISK_PROFILES)},
+            "goal": {"type": "string"},
+            "weights": {
+                "type": "object",
+                "properties": {label: {"type": "number", "minimum": 0, "maximum": 1} for label in labels},
+                "required": labels,
+                "property_ordering": labels,
+            },
+        },
+        "required": ["summary", "risk_profile", "goal", "weights"],
+        "property_ordering": ["summary", "risk_profile", "goal", "weights"],
+    }
+
+
+def parse_advice(text: str, labels: Sequence[str], tickers: Sequence[str] = ()) -> Advice:
+    """
+    Read a reply written against ``advice_schema``.
+
+    A reply that is not a JSON object (e.g. truncated) still yields its
+    allocation through ``parse_allocation``; the summary then reads NO_INFO
+    and the profile fields are empty.
+
+    Raises:
+        AllocationParseError: The reply holds no usable allocation.
+    """
+    try:
+        reply = json.loads(text)
+    except ValueError:
+        reply = None
+    if not isinstance(reply, dict) or not isinstance(reply.get("weights"), (dict, list)):
+        allocation = parse_allocation(text, labels, tickers)
+        allocation.repairs.insert(0, "reply did not follow the schema; kept the allocation only")
+        return Advice(allocation=allocation, summary=NO_INFO, risk_profile="", goal="")
+
+    return Advice(
+        allocation=repair_allocation(reply["weights"], labels, tickers),
+        summary=str(reply.get("summary") or NO_INFO).strip(),
+        risk_profile=str(reply.get("risk_profile") or ""),
+        goal=str(reply.get("goal") or ""),
+    )
@@ -1,175 +1,285 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from deepgram import Deepgram
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, HTTPException, status, Response, Depends
 import asyncio
 import os
 import json
-import ast
 import requests
-from app.pydantic_models import FinalResult, Asset
-import urllib.parse
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from concurrent.futures import TimeoutError
+from app.pydantic_models import FinalResult, Asset, Sentiment
+from app.allocation_parser import NO_INFO, Advice, AllocationParseError, advice_schema, parse_advice, repair_allocation
+from app.llm import LLMProvider, get_provider, latency_budget, rule_based_advice
 from app.api.routes.stats import *
-from app.sentiment_analysis import get_sentiment_score
-from app.api.routes.historical import asset_list
+from app.sentiment_analysis import submit_sentiment
+from app.api.routes.historical import asset_list, portfolio_builder, allocation_risk
+from app.price_store import price_store
+from app.result_cache import result_cache
+from app.benchmark import benchmark_returns
+from app.downsampling import downsample_points
+from typing import Optional, List, Dict
 
 
-api_key_gemini = os.getenv("LLM_API_KEY")
-api_key_gemini_luca = os.getenv("LLM_API_KEY")
+router = APIRouter(prefix="/gpt")
 
+ASSET_LABELS = [label for label, _ in asset_list]
+ADVICE_SCHEMA = advice_schema(ASSET_LABELS)
 
-from google import genai
+# Grace period (seconds) send_text gives an unfinished sentiment job once the
+# result is built; past it the job is cancelled and the sentiment left empty.
+SENTIMENT_WAIT = float(os.getenv("SENTIMENT_WAIT", 0.05))
 
-client = genai.Client(api_key=api_key_gemini)
-client2 = genai.Client(api_key=api_key_gemini_luca)
+# Sessions whose last good advice is kept for deadline fallbacks.
+LAST_GOOD_SESSIONS = int(os.getenv("LAST_GOOD_SESSIONS", 1024))
 
-router = APIRouter(prefix="/gpt")
+# session_id -> cancel event of its in-flight send_text request.
+_sessions: Dict[str, threading.Event] = {}
+_sessions_lock = threading.Lock()
 
-@router.post("/send_text", response_model=FinalResult, tags=["gpt"])
-def send_gpt(text: str):
-      model = "GEMINI"
-   
-   
-      query_info = f"""
-      Between the tags, you will find a conversation between a financial advisor and their client.  
-This conversation may be incomplete.  
-
-<tag>  
-{text}  
-</tag>  
-
-### **Your Task:**  
-Analyze the conversation and summarize the client from a **financial perspective** by identifying:  
-1. **Financial situation** (if mentioned).  
-2. **Investment goals** (if available).  
-3. **Risk profile** (if possible).  
-
-### **Response Format (STRICT RULES)**  
-- If sufficient information is available, return a **concise summary** in plain text.  
-- If the conversation lacks sufficient details, return exactly 'No info yet'.
 
-       """
+def start_request(session_id):
+      """Cancel event of a new request; supersedes the session's previous request."""
+      cancel = threading.Event()
+      if session_id is not None:
+         with _sessions_lock:
+            previous = _sessions.get(session_id)
+            if previous is not None:
+               previous.set()
+            _sessions[session_id] = cancel
+      return cancel
 
-      encoded_query_info = urllib.parse.quote(query_info)
 
-      
-      response2 = client.models.generate_content(
-      model="gemini-2.0-flash", contents=encoded_query_info
-      )
-      
-      info_client = response2.text
-      
+def end_request(session_id, cancel):
+      if session_id is not None:
+         with _sessions_lock:
+            if _sessions.get(session_id) is cancel:
+               del _sessions[session_id]
 
-      query = f"""
-       You must define an asset allocation based on the information provided in the text enclosed within <tag></tag>.  
 
-        Consider that this text is an excerpt from an actual conversation between a financial advisor and their client.  
-        The conversation may be incomplete.  
+def check_superseded(cancel):
+      if cancel.is_set():
+         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Superseded by a newer request for this session")
 
-        <tag>  
-        {text}  
-        </tag>  
 
-        If the provided information is insufficient, create a very generic asset allocation.  
-
-        ### **Instructions:**  
-        1. Based on the information inside the <tag> section, determine the client's **risk profile**.  
-        2. Define an **asset allocation** using the following assets:  
-
-          - iShares Core S&P 500  
-          - iShares Core MSCI World  
-          - iShares Core MSCI Emerging Markets IMI  
-          - iShares Nasdaq 100  
-          - iShares MSCI ACWI  
-          - Vanguard FTSE All-World  
-          - iShares Core DAX  
-          - Lyxor Core STOXX Europe 600 (DR)  
-          - iShares Core MSCI Europe  
-          - Xtrackers MSCI USA  
-          - Xtrackers MSCI Emerging Markets  
-          - iShares Core EURO STOXX 50  
-          - Real Estate Sector  
-          - ETF Bond USA 7  
-          - ETF Bond USA 10  
-          - ETF Bond USA 15  
-          - ETF Bond USA 20  
-          - ETF Bond USA 30  
-          - ETF Inflation Adjusted USA 7  
-          - ETF Inflation Adjusted USA 15  
-          - Bitcoin  
-          - Gold  
-          - Silver  
-          - Crude Oil  
-          - Cash Liquidity  
-
-        3. Assign a **weight** to each asset so that the sum of all weights is exactly **1**.  
+# session_id -> last advice parsed from a model reply, least recently used first.
+_last_advice: "OrderedDict[str, Advice]" = OrderedDict()
 
-        ### **Response Format (CRITICAL)**  
-        Return only a **single array** of exactly **24 elements**, where each element represents the weight of the corresponding asset.  
 
-        **DO NOT** include any extra text, explanations, or formatting. Your response must strictly follow this pattern:  
+def remember_advice(session_id, advice):
+      if session_id is None:
+         return
+      with _sessions_lock:
+         _last_advice[session_id] = advice
+         _last_advice.move_to_end(session_id)
+         while len(_last_advice) > LAST_GOOD_SESSIONS:
+            _last_advice.popitem(last=False)
 
-        plaintext
-        [0.1, 0.1, 0.2, 0.05, 0.00, 0.0, 0.1, 0.0, 0.05, 0.05, 0.0, 0.0, 0.1, 0.05, 0.0,
-        0.01, 0.06, 0.02, 0.00, 0.05, 0.0, 0.0, 0.02, 0.04] 
-       """
-      
-      encoded_query = urllib.parse.quote(query)
 
-      response = client.models.generate_content(
-      model="gemini-2.0-flash", contents=encoded_query
-      )
-      # url = f"https://idchat-api-containerapp01-dev.orangepebble-16234c4b.switzerlandnorth.azurecontainerapps.io/llm?query={encoded_query}"
-      # response = requests.post(url)
-      # str_weights = response.json()['content']
-      str_weights = response.text
-      
-      from app.api.routes.historical import portfolio_builder
-       
-       #final_result = FinalResult()
+def fallback_advice(session_id, text, reason):
+      """The session's last good advice, else the rule-based template for ``text``."""
+      with _sessions_lock:
+         last = _last_advice.get(session_id) if session_id is not None else None
+      if last is not None:
+         return replace(last, allocation=replace(last.allocation, repairs=[f"{reason}; kept the session's last allocation"]))
+      template = rule_based_advice(text, ASSET_LABELS)
+      allocation = repair_allocation(template["weights"], ASSET_LABELS)
+      allocation.repairs.insert(0, f"{reason}; used the {template['risk_profile']} template allocation")
+      return Advice(allocation=allocation, summary=template["summary"], risk_profile=template["risk_profile"], goal=template["goal"])
+
+
+def collect_sentiment(job, cancel, timings):
+      """Sentiment if it is done within SENTIMENT_WAIT; None if it fails or is too slow."""
+      try:
+         result, seconds = job.result(timeout=SENTIMENT_WAIT)
+      except TimeoutError:
+         cancel.set()
+         job.cancel()
+         return None
+      except Exception:
+         return None
+      timings["sentiment"] = seconds
+      return Sentiment(**result)
+
+
+def server_timing(timings):
+      return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+# Metrics reported by default, by FinalResult list; anything else requested goes to stats3.
+STATS1 = ("Sharpe Ratio", "Sortino Ratio", "Calmar Ratio")
+STATS2 = ("Alpha", "Maximum Drawdown", "Total Return")
+DEFAULT_METRICS = STATS1 + STATS2 + TAIL_METRICS
 
-      weights = ast.literal_eval(str_weights)
-       
-      portfolio = portfolio_builder(weights)
 
-      #portfolio_list = portfolio.to_dict()
+def build_result(weights, version, metrics=None):
+      """Backtest, stats and payload for an allocation; info, risk profile and goal are filled in by the caller.
+
+      Only ``metrics`` (DEFAULT_METRICS when None) and what they depend on are computed.
+      """
+      portfolio = portfolio_builder(weights, version)
 
       portfolio['date'] = pd.to_datetime(portfolio.index)  # Ensure date is in datetime format
 
       portfolio_list = [{'date': row[1], 'value': row[0]} for row in portfolio.itertuples(index=False)]           
        
-      list_stats1 = [
-         get_sharpee_ratio(portfolio),
-         get_sortino_ratio(portfolio),
-         get_calmar_ratio(portfolio),
-         
-      ]
-
-      list_stats2 = [
-         
-         get_alpha(portfolio),
-         get_maximum_drawdown(portfolio),
-         get_total_return(portfolio),
-      ]
+      names = list(metrics or DEFAULT_METRICS)
+      values = compute_core_metrics(
+         portfolio["portfolio_value"].to_numpy(),
+         portfolio.index,
+         benchmark=benchmark_returns(portfolio.index, version).to_numpy(),
+         names=names,
+      )
+
+      list_stats1 = [{name: values[name]} for name in names if name in STATS1]
+
+      list_stats2 = [{name: values[name]} for name in names if name in STATS2]
+
+      list_stats3 = [{name: values[name]} for name in names if name not in STATS1 + STATS2]
+
+      risk = allocation_risk(weights, version)
 
       assets = []
       for i, weight in enumerate(weights):
           t = Asset(
               weight = weight,
-              label = asset_list[i][0]
+              label = asset_list[i][0],
+              **{name: float(values[0, i]) for name, values in risk.items()}
           )
           assets.append(t)
       
-      final_result = FinalResult(
+      return FinalResult(
               assets = assets,
               stats1 =  list_stats1,
               stats2 = list_stats2,
+              stats3 = list_stats3,
               time_serie =  portfolio_list,
-              risk_profile = "null",#r_info[1],
-              goal = "null",#r_info[0]
-              info = info_client
+              risk_profile = "",
+              goal = "",
+              info = ""
           )
-      
-      
-      return final_result
+
+
+@router.get("/cache", tags=["gpt"])
+def cache_stats():
+      return result_cache.stats()
+
+
+@router.post("/send_text", response_model=FinalResult, tags=["gpt"])
+def send_gpt(
+      response: Response,
+      text: str,
+      max_points: Optional[int] = Query(None, ge=3),
+      metrics: Optional[List[str]] = Query(None),
+      session_id: Optional[str] = None,
+      debug: bool = False,
+      provider: LLMProvider = Depends(get_provider),
+):
+      """
+      Allocation, stats and client summary for a conversation excerpt.
+
+      Sentiment is scored on its own executor while the LLM call runs. A newer
+      request with the same ``session_id`` cancels this one (409) and its
+      sentiment job. With ``debug`` the stage timings are returned in a
+      Server-Timing header. The LLM is the ``get_provider`` dependency
+      (LLM_PROVIDER), overridable in tests and benchmarks.
+
+      The LLM call runs under app.llm.latency_budget: a slow call is hedged,
+      and at LLM_DEADLINE (or on an unusable reply) the session's last good
+      allocation, else a rule-based template, is returned with ``provisional``
+      set.
+      """
+      unknown = set(metrics or ()) - set(available_metrics())
+      if unknown:
+         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unknown metrics: {', '.join(sorted(unknown))}")
+
+      started = time.perf_counter()
+      timings = {}
+      cancel = start_request(session_id)
+      sentiment_job = submit_sentiment(text, cancel)
+      try:
+         result = generate_result(provider, text, max_points, metrics, session_id, cancel, sentiment_job, timings)
+      except BaseException:
+         cancel.set()
+         raise
+      finally:
+         end_request(session_id, cancel)
+
+      timings["total"] = time.perf_counter() - started
+      if debug:
+         response.headers["Server-Timing"] = server_timing(timings)
+      return result
+
+
+def generate_result(provider, text, max_points, metrics, session_id, cancel, sentiment_job, timings):
+      """LLM call and result assembly of send_text, recording stage timings."""
+
+      assets = "\n".join(f"          - {label}  " for label in ASSET_LABELS)
+      query = f"""
+       Between the tags, you will find an excerpt from an actual conversation between a financial advisor and their client.  
+        The conversation may be incomplete.  
+
+        <tag>  
+        {text}  
+        </tag>  
+
+        ### **Your Task:**  
+        1. Summarize the client from a **financial perspective**: financial situation, investment goals and risk profile (if mentioned).  
+           If the conversation lacks sufficient details, the summary is exactly '{NO_INFO}'.  
+        2. Determine the client's **risk profile** and main **investment goal**.  
+        3. Define an **asset allocation** using the following assets:  
+
+{assets}
+
+           Assign a **weight** to each asset so that the sum of all weights is exactly **1**.  
+           If the provided information is insufficient, create a very generic asset allocation.  
+
+        ### **Response Format (CRITICAL)**  
+        Return a single JSON object following the response schema: "summary", "risk_profile", "goal" and "weights" (asset name -> weight).  
+       """
+
+      stage = time.perf_counter()
+      reply = latency_budget.generate(provider, query, ADVICE_SCHEMA)
+      timings["llm"] = time.perf_counter() - stage
+      check_superseded(cancel)
+
+      # Repair the reply locally instead of paying for another LLM round trip;
+      # without a usable one, answer provisionally rather than wait or fail.
+      provisional = reply.text is None
+      if not provisional:
+         try:
+            advice = parse_advice(reply.text, ASSET_LABELS, [ticker for _, ticker in asset_list])
+         except AllocationParseError as e:
+            provisional, reply.error = True, f"unusable reply ({e})"
+         else:
+            remember_advice(session_id, advice)
+      if provisional:
+         advice = fallback_advice(session_id, text, f"LLM {reply.error}")
+      if reply.hedged:
+         timings["hedge"] = latency_budget.hedge_delay()
+      allocation = advice.allocation
+      weights = allocation.weights
+
+      stage = time.perf_counter()
+      with price_store.acquire() as version:
+         result = result_cache.get_or_build(
+            result_cache.key(version, weights, tuple(metrics or ())),
+            lambda: build_result(weights, version, metrics),
+         )
+      timings["build"] = time.perf_counter() - stage
+
+      # The cached result keeps the full-resolution curve for export.
+      update = {
+         "info": advice.summary,
+         "risk_profile": advice.risk_profile,
+         "goal": advice.goal,
+         "sentiment": collect_sentiment(sentiment_job, cancel, timings),
+         "repairs": allocation.repairs,
+         "provisional": provisional,
+      }
+      if max_points is not None:
+         update["time_serie"] = downsample_points(result.time_serie, max_points)
+      return result.model_copy(update=update)
 
     #portfolio builder ritorna un dataframe
 
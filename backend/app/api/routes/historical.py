@@ -2,7 +2,18 @@ from fastapi import APIRouter, HTTPException, status, Depends, Request
 from app.pydantic_models import *
 import pickle
 import pandas as pd
+import numpy as np
 import os
+from app.price_store import price_store, LOOKBACK_YEARS, PERIODS_PER_YEAR
+from app.backtest import run_backtest, CostSchedule, INITIAL_VALUE
+from app.simulation import simulate
+from app.rolling import walk_forward
+from app.downsampling import downsample_points
+from app.stress import stress_test
+from app.frontier import frontier_service, portfolio_risk
+from app.covariance import get_estimates
+from app.optimization import optimizer
+from app.risk import risk_contributions
 
 
 asset_list = [
@@ -32,6 +43,7 @@ asset_list = [
 ["Cash Liquidity", "CSH.PA"]]
 
 duration_backtest = 10
+annual_risk_free_rate = 0.02
 
 router = APIRouter(prefix="/portfolio")
 
@@ -41,21 +53,318 @@ def load_pickle(file_path):
         return pickle.load(f)
 
 
-def portfolio_builder(weights):
-    
-    portfolio_df = load_pickle("./app/files/portfolio.pkl")
-    portfolio_df = portfolio_df.resample('W').last()
+def align_weights(weights, columns):
+    """Map weights given in asset_list order onto the price columns (batch friendly)."""
+    weights = np.asarray(weights, dtype=float)
+    if weights.shape[-1] > len(asset_list):
+        raise ValueError(f"Expected at most {len(asset_list)} weights, got {weights.shape[-1]}")
+    tickers = np.array([ticker for _, ticker in asset_list[:weights.shape[-1]]])
+    mapping = (tickers[:, None] == np.asarray(columns)[None, :]).astype(float)
+    return weights @ mapping
+
+
+def backtest_allocation(weights, version=None, policy="calendar", frequency="quarterly", band=0.05, costs=None, freq="W", lookback_years=LOOKBACK_YEARS):
+    """Backtest asset_list-ordered weights (one allocation or a batch) on a store version.
 
-    most_recent_year = portfolio_df.index.max().year
-    portfolio_df =  portfolio_df[portfolio_df.index.year >= most_recent_year - 3]
+    ``costs`` is an optional {ticker: (bps, spread)} mapping or a CostSchedule.
+    """
+    if version is None:
+        version = price_store.current
+    prices = version.frame(freq, lookback_years).bfill()
+    if costs is not None and not isinstance(costs, CostSchedule):
+        costs = CostSchedule.from_mapping(costs, prices.columns)
 
+    return run_backtest(
+        prices,
+        align_weights(weights, prices.columns),
+        policy=policy,
+        frequency=frequency,
+        band=band,
+        costs=costs,
+    )
 
-    weighted_df = portfolio_df * weights
 
-    portfolio_df = pd.DataFrame(index = weighted_df.index)
-    portfolio_df["portfolio_value"] = weighted_df.sum(axis = 1)
+def to_time_serie(index, values):
+    return [{'date': date, 'value': float(value)} for date, value in zip(index, values)]
 
-    print(portfolio_df)
 
+def portfolio_builder(weights, version=None, **kwargs):
+    
+    result = backtest_allocation(weights, version, **kwargs)
+
+    portfolio_df = result.to_frame()
     portfolio_df.dropna(inplace = True)
     return portfolio_df
+
+
+def allocation_risk(weights, version=None, freq="W"):
+    """Volatility and CVaR contributions of asset_list-ordered weights, one column per entry.
+
+    Marginal volatility is annualised; CVaR is a per-period loss. Uses the
+    cached covariance and returns of the version, and works on batches.
+    """
+    if version is None:
+        version = price_store.current
+    estimates = get_estimates(version, freq)
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    weights = weights / weights.sum(axis=1, keepdims=True)
+    risk = risk_contributions(align_weights(weights, estimates.columns), estimates.cov, version.returns(freq).to_numpy())
+
+    # Entries sharing a ticker share its marginal risk; shares follow each entry's own weight.
+    columns = [estimates.columns.index(ticker) for _, ticker in asset_list[:weights.shape[1]]]
+    marginal_volatility = risk.marginal_volatility[:, columns]
+    marginal_cvar = risk.marginal_cvar[:, columns]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volatility_share = np.nan_to_num(weights * marginal_volatility / risk.volatility[:, None])
+        cvar_share = np.nan_to_num(weights * marginal_cvar / risk.cvar[:, None])
+    return {
+        "marginal_volatility": marginal_volatility * PERIODS_PER_YEAR[freq] ** 0.5,
+        "volatility_share": volatility_share,
+        "marginal_cvar": marginal_cvar,
+        "cvar_share": cvar_share,
+    }
+
+
+@router.post("/backtest", response_model=BacktestResponse, tags=["portfolio"])
+def backtest(request: BacktestRequest):
+    costs = None
+    if request.costs:
+        costs = {ticker: (cost.bps, cost.spread) for ticker, cost in request.costs.items()}
+
+    with price_store.acquire() as version:
+        try:
+            result = backtest_allocation(
+                request.weights,
+                version,
+                policy=request.policy,
+                frequency=request.frequency,
+                band=request.band,
+                costs=costs,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    response = BacktestResponse(
+        time_serie=downsample_points(to_time_serie(result.index, result.values[:, 0]), request.max_points),
+        rebalances=int(result.rebalances[:, 0].sum()),
+        version=version.version_id,
+    )
+    if result.net_values is not None:
+        response.net_time_serie = downsample_points(to_time_serie(result.index, result.net_values[:, 0]), request.max_points)
+        response.turnover = float(result.turnover[1:, 0].sum())
+        response.cost_drag = float(1 - result.net_values[-1, 0] / result.values[-1, 0])
+    return response
+
+
+@router.post("/simulate", response_model=SimulationResponse, tags=["portfolio"])
+def simulate_allocation(request: SimulationRequest):
+    with price_store.acquire() as version:
+        returns = version.returns("W")
+        try:
+            weights = align_weights(request.weights, returns.columns)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        if weights.sum() <= 0:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Weights must have a positive sum")
+        result = simulate(
+            returns.to_numpy(),
+            weights / weights.sum(),
+            paths=request.paths,
+            horizon=request.horizon,
+            block=request.block,
+            seed=request.seed,
+            target=request.target,
+        )
+
+    dates = pd.date_range(returns.index[-1], periods=request.horizon + 1, freq="W")[1:]
+    fan_chart = [
+        {'date': date, **{f"p{level}": float(INITIAL_VALUE * result.percentiles[j, i, 0]) for j, level in enumerate(result.levels)}}
+        for i, date in enumerate(dates)
+    ]
+    return SimulationResponse(
+        fan_chart=fan_chart,
+        hit_probability=float(result.hit_probability[0]) if result.hit_probability is not None else None,
+        expected_value=float(INITIAL_VALUE * result.final_mean[0]),
+        version=version.version_id,
+    )
+
+
+@router.post("/walk_forward", response_model=WalkForwardResponse, tags=["portfolio"])
+def walk_forward_allocation(request: WalkForwardRequest):
+    with price_store.acquire() as version:
+        try:
+            result = backtest_allocation(
+                request.weights,
+                version,
+                policy=request.policy,
+                frequency=request.frequency,
+                freq=request.freq,
+                lookback_years=request.lookback_years,
+            )
+            windows = walk_forward(
+                pd.DataFrame(result.values, index=result.index),
+                request.window,
+                request.step,
+                PERIODS_PER_YEAR[request.freq],
+                rf=annual_risk_free_rate,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    metrics = {
+        "Total Return": windows.total_return[:, 0],
+        "Volatility": windows.volatility[:, 0],
+        "Sharpe Ratio": windows.sharpe[:, 0],
+        "Drawdown": windows.drawdown[:, 0],
+        "Maximum Drawdown": windows.max_drawdown[:, 0],
+    }
+    levels = (5, 25, 50, 75, 95)
+    distribution = {
+        name: {"mean": float(np.nanmean(series)), **{f"p{level}": float(q) for level, q in zip(levels, np.nanpercentile(series, levels))}}
+        for name, series in metrics.items()
+    }
+    windows_list = [
+        {'start': start, 'date': end, **{name: float(series[i]) for name, series in metrics.items()}}
+        for i, (start, end) in enumerate(zip(windows.starts, windows.ends))
+    ]
+    return WalkForwardResponse(distribution=distribution, windows=windows_list, version=version.version_id)
+
+
+@router.post("/stress", response_model=StressResponse, tags=["portfolio"])
+def stress_allocation(request: StressRequest):
+    with price_store.acquire() as version:
+        try:
+            weights = align_weights(request.weights, version.prices.columns)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        if weights.sum() <= 0:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Weights must have a positive sum")
+        results = stress_test(weights, version)
+
+    scenarios = []
+    for name, result in results.items():
+        recovery_days = result["Recovery Days"][0]
+        scenarios.append({
+            'scenario': name,
+            'start': result["Start"],
+            'end': result["End"],
+            'return': float(result["Return"][0]),
+            'max_drawdown': float(result["Maximum Drawdown"][0]),
+            'recovery_days': None if np.isnan(recovery_days) else int(recovery_days),
+        })
+    return StressResponse(scenarios=scenarios, version=version.version_id)
+
+
+def _ready_frontier(version, risk_measure):
+    frontier = frontier_service.get(version, "W", risk_measure)
+    if frontier is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The efficient frontier for the current prices is still being computed",
+            headers={"Retry-After": "5"},
+        )
+    return frontier
+
+
+def _frontier_point(frontier, i):
+    return FrontierPoint(
+        risk=float(frontier.risk[i] * frontier.risk_scale),
+        expected_return=float(frontier.ret[i] * frontier.periods),
+        weights={ticker: float(w) for ticker, w in zip(frontier.columns, frontier.weights[i]) if w > 1e-6},
+    )
+
+
+@router.get("/frontier", response_model=FrontierResponse, tags=["portfolio"])
+def get_frontier(risk_measure: Literal["MV", "CVaR"] = "MV"):
+    with price_store.acquire() as version:
+        frontier = _ready_frontier(version, risk_measure)
+    return FrontierResponse(
+        risk_measure=risk_measure,
+        points=[_frontier_point(frontier, i) for i in range(len(frontier.risk))],
+        version=version.version_id,
+    )
+
+
+@router.post("/frontier/nearest", response_model=FrontierPoint, tags=["portfolio"])
+def nearest_frontier_portfolio(request: FrontierNearestRequest):
+    with price_store.acquire() as version:
+        frontier = _ready_frontier(version, request.risk_measure)
+    return _frontier_point(frontier, frontier.nearest(request.target_risk / frontier.risk_scale))
+
+
+@router.post("/frontier/distance", response_model=FrontierDistanceResponse, tags=["portfolio"])
+def frontier_distance(request: FrontierDistanceRequest):
+    with price_store.acquire() as version:
+        frontier = _ready_frontier(version, request.risk_measure)
+        try:
+            weights = align_weights(request.weights, frontier.columns)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        if weights.sum() <= 0:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Weights must have a positive sum")
+        weights = weights / weights.sum()
+        returns = version.returns("W").to_numpy() if request.risk_measure == "CVaR" else None
+        risk = float(portfolio_risk(weights[None, :], request.risk_measure, frontier.cov, returns)[0])
+
+    ret = float(weights @ frontier.mu)
+    gaps = frontier.distance(risk, ret)
+    return FrontierDistanceResponse(
+        risk=risk * frontier.risk_scale,
+        expected_return=ret * frontier.periods,
+        return_gap=gaps["return_gap"] * frontier.periods,
+        risk_gap=gaps["risk_gap"] * frontier.risk_scale,
+        nearest=_frontier_point(frontier, frontier.nearest(risk)),
+        version=version.version_id,
+    )
+
+
+@router.post("/optimize", response_model=OptimizationResponse, tags=["portfolio"])
+def optimize_allocation(request: OptimizationRequest):
+    with price_store.acquire() as version:
+        estimates = get_estimates(version, "W", request.covariance)
+    periods = PERIODS_PER_YEAR["W"]
+
+    try:
+        lower = np.full(len(estimates.columns), request.min_weight)
+        upper = np.full(len(estimates.columns), request.max_weight)
+        for ticker, (low, high) in (request.bounds or {}).items():
+            if ticker not in estimates.columns:
+                raise ValueError(f"Unknown ticker: {ticker}")
+            if low > high:
+                raise ValueError(f"Lower bound above upper bound for {ticker}")
+            lower[estimates.columns.index(ticker)], upper[estimates.columns.index(ticker)] = low, high
+
+        result = optimizer.optimize(
+            estimates,
+            request.objective,
+            session_id=request.session_id,
+            lower=lower,
+            upper=upper,
+            target_volatility=request.target_volatility,
+            periods=periods,
+            risk_free_rate=request.risk_free_rate,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    weights = dict(zip(estimates.columns, result.weights))
+    # Duplicated tickers in asset_list get their weight on the first occurrence only.
+    seen = set()
+    asset_weights = []
+    for _, ticker in asset_list:
+        asset_weights.append(float(weights.get(ticker, 0.0)) if ticker not in seen else 0.0)
+        seen.add(ticker)
+
+    ret = float(result.weights @ estimates.mu) * periods
+    volatility = float(np.sqrt(result.weights @ estimates.cov @ result.weights * periods))
+    return OptimizationResponse(
+        weights={ticker: float(w) for ticker, w in weights.items() if w > 1e-6},
+        asset_weights=asset_weights,
+        expected_return=ret,
+        volatility=volatility,
+        sharpe=(ret - request.risk_free_rate) / volatility,
+        status=result.status,
+        solve_ms=result.solve_time * 1000,
+        warm_started=result.warm_started,
+        version=version.version_id,
+    )
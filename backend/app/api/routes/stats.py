@@ -2,64 +2,143 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Request
 import pandas as pd
 import numpy as np
-import quantstats as qs
-import empyrical as ep
-import riskfolio as rp
-from arch import arch_model
+from app.benchmark import benchmark_returns
+from app.garch import garch_service
+from app.price_store import price_store, PERIODS_PER_YEAR
+from app.pydantic_models import VolatilityRequest, VolatilityResponse, RollingRequest, RollingResponse
+from app.api.routes.historical import align_weights, backtest_allocation, to_time_serie, annual_risk_free_rate
+from app.rolling import rolling_metrics
+from app.downsampling import downsample_points
+from app.metrics import evaluate, available_metrics
 
 router = APIRouter(prefix="/stats")
 
-# TEST VARIABLES --------------------------------
-portfolio_data = pd.DataFrame({
-    "date": pd.date_range(start="2022-01-01", periods=500, freq="D"),
-    "portfolio_value": np.cumsum(np.random.normal(0.5, 2, 500)) + 1000
-})
-portfolio_data.set_index("date", inplace=True)
+RISK_FREE_RATE = 0.02 / 252
 
-portfolio_data["returns"] = portfolio_data["portfolio_value"].pct_change().dropna()
+# Tail probability of the VaR/CVaR metrics (95% confidence).
+TAIL_PROBABILITY = 0.05
+
+TAIL_METRICS = (
+    "Value at Risk",
+    "Conditional Value at Risk",
+    "Cornish-Fisher VaR",
+    "Cornish-Fisher CVaR",
+    "Omega Ratio",
+    "Ulcer Index",
+    "Skew",
+    "Kurtosis",
+)
+
+
+def compute_core_metrics(values, index=None, rf=RISK_FREE_RATE, periods=252, dtype=None, benchmark=None, tail=TAIL_PROBABILITY, names=None):
+    """
+    Vectorised batch version of the quantstats/empyrical metrics, in one pass.
+
+    Metrics come from the registry in app.metrics: only ``names`` (by
+    default every metric whose inputs were given) and the intermediates
+    they declare are computed, each once.
+
+    Follows the conventions of quantstats (first return is 0, rf
+    de-annualised with ``periods``, CAGR years = days / 252) so results match
+    it to rounding; tests/test_metrics.py checks the parity.
+
+    Args:
+        values (array-like): Portfolio values, shape (T,) or (T, N) for a batch.
+        index (DatetimeIndex): Dates of the rows, needed for the Calmar ratio.
+        dtype: Compute dtype; defaults to the dtype of ``values``.
+        benchmark (array-like): Benchmark returns aligned with the rows of
+            ``values`` (the first one is ignored); adds Alpha, Beta, Tracking
+            Error and Information Ratio, with empyrical's conventions for alpha.
+        tail (float): Tail probability of the VaR and CVaR (0.05 for 95%).
+        names (Iterable[str]): Metrics to compute; see metrics.available_metrics().
+
+    Tail metrics share one sort of the returns and one set of central
+    moments. Skew, Kurtosis (excess), Omega Ratio and Ulcer Index match
+    quantstats; VaR and CVaR are per-period returns (negative for losses),
+    historical (linear quantile, mean of the returns at or below it) and
+    Cornish-Fisher (CVaR as the mean of the expanded quantiles over the tail).
+
+    Returns:
+        dict: Metric name -> float, or ndarray of shape (N,) for a batch.
+
+    Error bounds in float32 (unit roundoff u = 2**-24): cumulative returns,
+    Total Return and Maximum Drawdown carry a relative error of at most
+    (T + 2) * u (~3e-4 for 20 years of daily bars), typically sqrt(T) * u.
+    Sharpe and Sortino inherit the error of the mean excess return,
+    about T * u * mean(|r|) / |mean(r)|, i.e. ~1e-4 relative unless the mean
+    return is close to zero. Calmar combines both.
+    """
+    return evaluate(names, dtype=dtype, values=values, index=index, rf=rf, periods=periods, benchmark=benchmark, tail=tail)
+
+
+@router.get("/metrics", tags=["stats"])
+def list_metrics():
+    """Names accepted by the ``metrics`` selection of send_text."""
+    return available_metrics()
+
+
+@router.post("/volatility", response_model=VolatilityResponse, tags=["stats"])
+def volatility_forecast(request: VolatilityRequest):
+    """GARCH(1,1) volatility forecast per asset and, given weights, for the portfolio (CCC)."""
+    with price_store.acquire() as version:
+        forecast = garch_service.forecast(version, request.horizon)
+        if forecast is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Volatility models for the current prices are still being fitted",
+                headers={"Retry-After": "5"},
+            )
+        portfolio = None
+        if request.weights is not None:
+            try:
+                weights = align_weights(request.weights, forecast.columns)
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+            if weights.sum() <= 0:
+                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Weights must have a positive sum")
+            portfolio = float(forecast.portfolio_volatility(weights / weights.sum())[0])
+
+    return VolatilityResponse(
+        assets={ticker: float(vol) for ticker, vol in zip(forecast.columns, forecast.volatility)},
+        portfolio=portfolio,
+        horizon=request.horizon,
+        version=version.version_id,
+    )
 
-RISK_FREE_RATE = 0.02 / 252
-#----------------------------------------------------------------
-
-
-def get_sharpee_ratio(portfolio_data):
-    portfolio_data["returns"] = portfolio_data["portfolio_value"].pct_change().dropna()
-    
-    sharpe = qs.stats.sharpe(portfolio_data["returns"], rf=RISK_FREE_RATE)
-    return {"Sharpe Ratio": float(sharpe)}
-
-def get_sortino_ratio(portfolio_data):
-    
-    portfolio_data["returns"] = portfolio_data["portfolio_value"].pct_change().dropna()
-    sortino = qs.stats.sortino(portfolio_data["returns"], rf=RISK_FREE_RATE)
-    return {"Sortino Ratio": float(sortino)}
-
-def get_calmar_ratio(portfolio_data):
-    
-    portfolio_data["returns"] = portfolio_data["portfolio_value"].pct_change().dropna()
-    calmar = qs.stats.calmar(portfolio_data["returns"])
-    return {"Calmar Ratio": float(calmar)}
-
-def get_alpha(portfolio_data):
-    
-    portfolio_data["returns"] = portfolio_data["portfolio_value"].pct_change().dropna()
-    market_returns = portfolio_data["returns"]  # Sostituisci con benchmark reale se disponibile
-    alpha = ep.alpha(portfolio_data["returns"], market_returns, risk_free=RISK_FREE_RATE)
-    return {"Alpha": float(alpha)}
-
-
-def get_maximum_drawdown(portfolio_data):
-    
-    portfolio_data["returns"] = portfolio_data["portfolio_value"].pct_change().dropna()
-    
-    max_drawdown = qs.stats.max_drawdown(portfolio_data["returns"])
-    return {"Maximum Drawdown": float(max_drawdown)}
-
-def get_total_return(portfolio_data):
-    
-    portfolio_data["returns"] = portfolio_data["portfolio_value"].pct_change().dropna()
-    
-    total_return = qs.stats.comp(portfolio_data["returns"])
-    return {"Total Return": float(total_return)}
 
+@router.post("/rolling", response_model=RollingResponse, tags=["stats"])
+def rolling_stats(request: RollingRequest):
+    """Rolling Sharpe, volatility, beta and drawdown of an allocation, plus its underwater curve."""
+    with price_store.acquire() as version:
+        try:
+            result = backtest_allocation(
+                request.weights,
+                version,
+                policy=request.policy,
+                frequency=request.frequency,
+                freq=request.freq,
+                lookback_years=request.lookback_years,
+            )
+            rolling = rolling_metrics(
+                pd.DataFrame(result.values, index=result.index),
+                request.window,
+                PERIODS_PER_YEAR[request.freq],
+                rf=annual_risk_free_rate,
+                benchmark=benchmark_returns(result.index, version, request.freq, lookback_years=request.lookback_years),
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
 
+    values = result.values[:, 0]
+    series = {
+        "Sharpe Ratio": to_time_serie(rolling.index, rolling.sharpe[:, 0]),
+        "Volatility": to_time_serie(rolling.index, rolling.volatility[:, 0]),
+        "Beta": to_time_serie(rolling.index, rolling.beta[:, 0]),
+        "Drawdown": to_time_serie(rolling.index, rolling.drawdown[:, 0]),
+        "Underwater": to_time_serie(result.index, values / np.maximum.accumulate(values) - 1),
+    }
+    return RollingResponse(
+        series={name: downsample_points(points, request.max_points) for name, points in series.items()},
+        window=request.window,
+        version=version.version_id,
+    )
@@ -0,0 +1,219 @@
+from dataclasses import dataclass
+from typing import Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+POLICIES = ("buy_and_hold", "calendar", "threshold")
+
+# Calendar rebalancing frequencies -> pandas period aliases.
+REBALANCE_FREQUENCIES = {"monthly": "M", "quarterly": "Q", "annual": "Y"}
+
+INITIAL_VALUE = 100.0
+
+
+@dataclass
+class CostSchedule:
+    """Per-asset trading costs in basis points: commission plus full bid-ask spread."""
+
+    bps: np.ndarray
+    spread: np.ndarray
+
+    @classmethod
+    def from_mapping(cls, costs: Mapping[str, Sequence[float]], columns) -> "CostSchedule":
+        """Build from {ticker: (bps, spread)}; unlisted assets trade for free."""
+        bps = np.array([costs.get(column, (0.0, 0.0))[0] for column in columns], dtype=float)
+        spread = np.array([costs.get(column, (0.0, 0.0))[1] for column in columns], dtype=float)
+        return cls(bps=bps, spread=spread)
+
+    @property
+    def rates(self) -> np.ndarray:
+        """Cost per unit of traded value (half the spread is paid on each trade)."""
+        return (self.bps + self.spread / 2) / 1e4
+
+
+@dataclass
+class BacktestResult:
+    index: pd.DatetimeIndex
+    values: np.ndarray                        # (T, N) gross portfolio values
+    rebalances: np.ndarray                    # (T, N) True where the portfolio was rebalanced at the close
+    net_values: Optional[np.ndarray] = None   # (T, N) values after trading costs
+    turnover: Optional[np.ndarray] = None     # (T, N) value traded at each close, as a fraction of value
+    costs: Optional[np.ndarray] = None        # (T, N) costs paid at each close, as a fraction of value
+
+    def to_frame(self, column: int = 0) -> pd.DataFrame:
+        df = pd.DataFrame({"portfolio_value": self.values[:, column]}, index=self.index)
+        if self.net_values is not None:
+            df["net_value"] = self.net_values[:, column]
+        return df
+
+
+def normalize_weights(weights) -> np.ndarray:
+    """Return weights as an (N, K) array whose rows sum to 1."""
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    totals = weights.sum(axis=1, keepdims=True)
+    if np.any(totals <= 0):
+        raise ValueError("Weights must have a positive sum")
+    return weights / totals
+
+
+def calendar_starts(index: pd.DatetimeIndex, frequency: str) -> np.ndarray:
+    """Rows at whose close a calendar rebalance happens (first bar of each period)."""
+    if frequency not in REBALANCE_FREQUENCIES:
+        raise ValueError(f"Unknown rebalancing frequency: {frequency}")
+    periods = index.to_period(REBALANCE_FREQUENCIES[frequency]).asi8
+    return np.concatenate(([0], np.flatnonzero(periods[1:] != periods[:-1]) + 1))
+
+
+# Drift scans: segments this short switch to a table of next breaches for a
+# block of candidate starts, which costs less per rebalance than one scan each.
+DENSE_SEGMENT = 4
+DENSE_BLOCK = 64
+
+
+def _breached(prices: np.ndarray, weights: np.ndarray, start_prices: np.ndarray, band: float) -> np.ndarray:
+    """Rows of ``prices`` where a portfolio bought at ``start_prices`` drifted past ``band``."""
+    # Holdings per unit of value at the start; the drifted weights are their value shares.
+    held = prices * (weights / start_prices)
+    value = held.sum(axis=-1)
+    return np.abs(held - value[..., None] * weights).max(axis=-1) > band * value
+
+
+def _next_breaches(prices: np.ndarray, weights: np.ndarray, band: float, low: int, high: int) -> np.ndarray:
+    """First breach within DENSE_SEGMENT bars of every start in [low, high), or -1."""
+    rows = np.arange(low, high)[:, None] + np.arange(1, DENSE_SEGMENT + 1)
+    valid = rows < prices.shape[0]
+    rows = np.minimum(rows, prices.shape[0] - 1)
+    breached = _breached(prices[rows], weights, prices[low:high, None, :], band) & valid
+    return np.where(breached.any(axis=1), rows[np.arange(high - low), breached.argmax(axis=1)], -1)
+
+
+def drift_starts(prices: np.ndarray, weights: np.ndarray, band: float) -> np.ndarray:
+    """Rows at which any asset weight has drifted more than ``band`` from target.
+
+    Scans forward from each rebalance in vectorised chunks that stop at the
+    first breach; a chunk starts at twice the previous segment length and
+    doubles while no breach is found, so each bar is evaluated about once.
+    When segments are short (tight bands), the next breach of a whole block
+    of candidate starts is computed at once and the chain is followed in it.
+    """
+    n = prices.shape[0]
+    starts = [0]
+    start, segment = 0, 8
+    table_low, table = 0, np.empty(0, dtype=np.intp)
+    while start < n - 1:
+        following = -1
+        low, length = start + 1, 2 * segment
+        if segment <= DENSE_SEGMENT:
+            if not table_low <= start < table_low + table.size:
+                table_low = start
+                table = _next_breaches(prices, weights, band, start, min(start + DENSE_BLOCK, n - 1))
+            following = table[start - table_low]
+            low = start + DENSE_SEGMENT + 1
+        while following < 0 and low < n:
+            high = min(low + length, n)
+            breached = np.flatnonzero(_breached(prices[low:high], weights, prices[start], band))
+            following = low + breached[0] if breached.size else -1
+            low, length = high, length * 2
+        if following < 0:
+            break
+        segment = following - start
+        starts.append(following)
+        start = following
+    return np.asarray(starts)
+
+
+def segment_growth(prices: np.ndarray, weights: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Growth of 1 unit for portfolios rebalanced to ``weights`` at ``starts``.
+
+    Bar t belongs to the segment opened by the last rebalance strictly before
+    it; within a segment the holdings are fixed, so its growth is a single
+    matmul of price relatives, and segments chain by cumulative product.
+    """
+    rows = np.arange(prices.shape[0])
+    segment = np.maximum(np.searchsorted(starts, rows, side="left") - 1, 0)
+    growth = (prices / prices[starts[segment]]) @ weights.T
+    segment_end = growth[starts[1:]]
+    segment_start = np.vstack([np.ones((1, weights.shape[0]), dtype=growth.dtype), np.cumprod(segment_end, axis=0)])
+    return segment_start[segment] * growth
+
+
+def rebalance_costs(prices: np.ndarray, weights: np.ndarray, starts: np.ndarray, rates: np.ndarray):
+    """Turnover and cost fraction of the initial purchase and of every rebalance.
+
+    Returns two (S, N) arrays, one row per entry of ``starts``. The weights a
+    rebalance trades back from are the targets drifted over the previous
+    segment, computed for all segments and portfolios at once.
+    """
+    relative = prices[starts[1:]] / prices[starts[:-1]]                 # (S-1, K)
+    drifted = weights[None, :, :] * relative[:, None, :]                # (S-1, N, K)
+    drifted /= drifted.sum(axis=2, keepdims=True)
+    traded = np.concatenate([weights[None, :, :], np.abs(weights[None, :, :] - drifted)])
+    return traded.sum(axis=2), traded @ rates
+
+
+def apply_costs(growth: np.ndarray, starts: np.ndarray, cost: np.ndarray) -> np.ndarray:
+    """Net growth: every bar carries the costs of all trades up to its close."""
+    paid = np.searchsorted(starts, np.arange(growth.shape[0]), side="right") - 1
+    return growth * np.cumprod(1 - cost, axis=0)[paid]
+
+
+def run_backtest(
+    prices: pd.DataFrame,
+    weights,
+    policy: str = "calendar",
+    frequency: str = "quarterly",
+    band: float = 0.05,
+    initial_value: float = INITIAL_VALUE,
+    costs: Optional[CostSchedule] = None,
+) -> BacktestResult:
+    """
+    Backtests one or a batch of allocations on a price frame.
+
+    Args:
+        prices (pd.DataFrame): Prices, one column per asset, without gaps.
+        weights (array-like): Target weights, shape (K,) or (N, K), aligned with the columns.
+        policy (str): "buy_and_hold", "calendar" or "threshold" (drift band).
+        frequency (str): Calendar policy frequency: "monthly", "quarterly" or "annual".
+        band (float): Threshold policy band on the absolute weight drift.
+        initial_value (float): Starting value of every portfolio.
+        costs (CostSchedule): Optional trading costs; turnover, costs and net
+            values are only computed when given.
+
+    Returns:
+        BacktestResult: Values and rebalance flags, one column per allocation.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown rebalancing policy: {policy}")
+    values = prices.to_numpy()
+    weights = normalize_weights(weights).astype(values.dtype, copy=False)
+    shape = (values.shape[0], weights.shape[0])
+    rebalances = np.zeros(shape, dtype=bool)
+    if costs is not None:
+        rates = costs.rates.astype(values.dtype, copy=False)
+        net_growth, turnover, cost = np.empty(shape, dtype=values.dtype), np.zeros(shape), np.zeros(shape)
+
+    if policy == "threshold":
+        growth = np.empty(shape, dtype=values.dtype)
+        for i, target in enumerate(weights):
+            starts = drift_starts(values, target, band)
+            growth[:, i] = segment_growth(values, target[None, :], starts)[:, 0]
+            rebalances[starts[1:], i] = True
+            if costs is not None:
+                traded, paid = rebalance_costs(values, target[None, :], starts, rates)
+                turnover[starts, i], cost[starts, i] = traded[:, 0], paid[:, 0]
+                net_growth[:, i] = apply_costs(growth[:, [i]], starts, paid)[:, 0]
+    else:
+        starts = calendar_starts(prices.index, frequency) if policy == "calendar" else np.array([0])
+        growth = segment_growth(values, weights, starts)
+        rebalances[starts[1:]] = True
+        if costs is not None:
+            traded, paid = rebalance_costs(values, weights, starts, rates)
+            turnover[starts], cost[starts] = traded, paid
+            net_growth = apply_costs(growth, starts, paid)
+
+    result = BacktestResult(index=prices.index, values=initial_value * growth, rebalances=rebalances)
+    if costs is not None:
+        result.net_values, result.turnover, result.costs = initial_value * net_growth, turnover, cost
+    return result
@@ -0,0 +1,71 @@
+import os
+import threading
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from app.price_store import DEFAULT_FREQ, LOOKBACK_YEARS, PriceStoreVersion, price_store
+
+
+# A single ticker ("SWDA.MI") or a blend rebalanced every period ("SWDA.MI:0.6,GOVT:0.4").
+BENCHMARK = os.getenv("BENCHMARK", "SWDA.MI")
+
+_cache: Dict[tuple, pd.Series] = {}
+_lock = threading.Lock()
+
+
+def parse_benchmark(spec: str) -> Dict[str, float]:
+    """Ticker -> weight (normalised to sum to 1) from a benchmark spec."""
+    weights = {}
+    for part in spec.split(","):
+        ticker, _, weight = part.strip().partition(":")
+        weights[ticker] = weights.get(ticker, 0.0) + (float(weight) if weight else 1.0)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Invalid benchmark spec: {spec}")
+    return {ticker: weight / total for ticker, weight in weights.items()}
+
+
+def benchmark_values(
+    version: PriceStoreVersion,
+    freq: str = DEFAULT_FREQ,
+    lookback_years: int = LOOKBACK_YEARS,
+    spec: str = BENCHMARK,
+) -> pd.Series:
+    """Benchmark growth of 1 over the store window, computed once per version, frequency and spec."""
+    key = version.cache_key("benchmark", freq, lookback_years, spec)
+    with _lock:
+        if key in _cache:
+            return _cache[key]
+
+    weights = parse_benchmark(spec)
+    returns = version.returns(freq, lookback_years)
+    missing = set(weights) - set(returns.columns)
+    if missing:
+        raise ValueError(f"Benchmark tickers not in the price store: {sorted(missing)}")
+    blended = returns[list(weights)].to_numpy() @ np.array(list(weights.values()), dtype=returns.dtypes.iloc[0])
+    values = pd.Series(
+        np.concatenate([[1.0], np.cumprod(1 + blended)]),
+        index=version.frame(freq, lookback_years).index,
+        name="benchmark",
+    )
+    with _lock:
+        _cache[key] = values
+    return values
+
+
+def benchmark_returns(index: pd.DatetimeIndex, version: PriceStoreVersion = None, freq: str = DEFAULT_FREQ, **kwargs) -> pd.Series:
+    """Benchmark returns on ``index`` (a subset of the ``freq`` grid); the first one is NaN."""
+    if version is None:
+        version = price_store.current
+    return benchmark_values(version, freq, **kwargs).reindex(index).pct_change()
+
+
+def _drop_version(version: PriceStoreVersion) -> None:
+    with _lock:
+        for key in [key for key in _cache if key[0] == version.content_hash]:
+            del _cache[key]
+
+
+price_store.on_collect(_drop_version)
@@ -0,0 +1,247 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.price_store import DEFAULT_FREQ, PriceStoreVersion, price_store
+
+
+METHODS = ("sample", "ewma", "ledoit_wolf")
+
+# RiskMetrics decay per bar; 0.94 is the daily standard, slower bars decay less.
+EWMA_DECAY = {"D": 0.94, "W": 0.97, "ME": 0.97}
+
+# Incremental updates chained before the moments are rebuilt from scratch,
+# bounding the rounding error accumulated by repeated downdates.
+REBUILD_AFTER = 64
+
+
+@dataclass(frozen=True)
+class Estimates:
+    """Per-period expected returns and covariance of the store universe."""
+
+    columns: list
+    mu: np.ndarray     # (K,)
+    cov: np.ndarray    # (K, K)
+    n: int
+
+
+@dataclass
+class RunningMoments:
+    """Sufficient statistics of a (T, K) return matrix.
+
+    Plain sums give the sample mean and covariance; the two extra terms
+    (sums of |x|^2 x and |x|^4) are all the Ledoit-Wolf intensity needs, so
+    rows can be added or removed in O(K^2) each instead of rescanning T.
+    The EWMA sum weights row t by decay ** (T - 1 - t).
+    """
+
+    index: pd.DatetimeIndex
+    columns: list
+    decay: float
+    n: int
+    total: np.ndarray        # (K,)  sum of x
+    outer: np.ndarray        # (K, K) sum of x x'
+    norm_total: np.ndarray   # (K,)  sum of |x|^2 x
+    norm4: float             # sum of |x|^4
+    ewma: np.ndarray         # (K, K) decayed sum of x x'
+    updates: int = 0
+
+    @classmethod
+    def build(cls, returns: pd.DataFrame, decay: float) -> "RunningMoments":
+        x = returns.to_numpy(dtype=np.float64)
+        k = x.shape[1]
+        moments = cls(
+            index=returns.index,
+            columns=list(returns.columns),
+            decay=decay,
+            n=0,
+            total=np.zeros(k),
+            outer=np.zeros((k, k)),
+            norm_total=np.zeros(k),
+            norm4=0.0,
+            ewma=np.zeros((k, k)),
+        )
+        moments._add(x, 1.0)
+        moments.ewma = moments._decayed_outer(x, len(x) - 1 - np.arange(len(x)))
+        return moments
+
+    def _add(self, x: np.ndarray, sign: float) -> None:
+        norms = np.einsum("tk,tk->t", x, x)
+        self.n += int(sign) * len(x)
+        self.total = self.total + sign * x.sum(axis=0)
+        self.outer = self.outer + sign * (x.T @ x)
+        self.norm_total = self.norm_total + sign * (norms @ x)
+        self.norm4 += sign * float(norms @ norms)
+
+    def _decayed_outer(self, x: np.ndarray, ages: np.ndarray) -> np.ndarray:
+        scaled = x * (self.decay ** ages)[:, None]
+        return scaled.T @ x
+
+    def update(self, old: pd.DataFrame, new: pd.DataFrame) -> Optional["RunningMoments"]:
+        """Moments of ``new`` derived from these moments of ``old``.
+
+        Handles the usual ways a window moves between versions: rows dropped at
+        the head (the window start moved), revised or dropped at the tail (a
+        partial bar was completed) and appended at the tail. Returns None when
+        the change is anything else or rebuilding would be as cheap.
+        """
+        if list(new.columns) != self.columns or len(new) == 0 or self.updates >= REBUILD_AFTER:
+            return None
+        head = self.index.searchsorted(new.index[0])
+        if head >= len(self.index) or self.index[head] != new.index[0]:
+            return None
+        overlap = min(len(self.index) - head, len(new))
+        old_x = old.to_numpy(dtype=np.float64)
+        new_x = new.to_numpy(dtype=np.float64)
+        same = (self.index[head:head + overlap] == new.index[:overlap]) & np.all(
+            old_x[head:head + overlap] == new_x[:overlap], axis=1
+        )
+        kept = int(np.argmin(same)) if not same.all() else overlap
+        removed = np.concatenate([old_x[:head], old_x[head + kept:]])
+        added = new_x[kept:]
+        if len(removed) + len(added) >= len(new):
+            return None
+
+        moments = RunningMoments(
+            index=new.index,
+            columns=self.columns,
+            decay=self.decay,
+            n=self.n,
+            total=self.total,
+            outer=self.outer,
+            norm_total=self.norm_total,
+            norm4=self.norm4,
+            ewma=self.ewma,
+            updates=self.updates + 1,
+        )
+        moments._add(removed, -1.0)
+        moments._add(added, 1.0)
+
+        old_ages = len(old_x) - 1 - np.arange(len(old_x))
+        dropped = np.r_[0:head, head + kept:len(old_x)]
+        ewma = self.ewma - self._decayed_outer(old_x[dropped], old_ages[dropped])
+        # Kept rows age by the net number of rows that now follow them.
+        ewma = ewma * self.decay ** (len(added) - (len(old_x) - head - kept))
+        moments.ewma = ewma + self._decayed_outer(added, len(added) - 1 - np.arange(len(added)))
+        return moments
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self.total / self.n
+
+    def sample(self) -> np.ndarray:
+        """Unbiased sample covariance (as np.cov)."""
+        return (self.outer - self.n * np.outer(self.mean, self.mean)) / (self.n - 1)
+
+    def ewma_cov(self) -> np.ndarray:
+        """RiskMetrics covariance: zero-mean, weights normalised to sum to one."""
+        return self.ewma * (1 - self.decay) / (1 - self.decay ** self.n)
+
+    def ledoit_wolf(self) -> np.ndarray:
+        """Ledoit-Wolf shrinkage towards a scaled identity (as sklearn.covariance.ledoit_wolf)."""
+        n, k, m = self.n, len(self.columns), self.mean
+        emp_cov = self.outer / n - np.outer(m, m)
+        mu = np.trace(emp_cov) / k
+        # Sum over rows of |x - m|^4, expanded into the running sums.
+        mm = m @ m
+        beta_ = (
+            self.norm4
+            - 4 * m @ self.norm_total
+            + 4 * m @ self.outer @ m
+            + 2 * mm * np.trace(self.outer)
+            - 4 * mm * (m @ self.total)
+            + n * mm ** 2
+        )
+        delta_ = np.sum(emp_cov ** 2)
+        beta = (beta_ / n - delta_) / (k * n)
+        delta = (delta_ - 2 * mu * np.trace(emp_cov) + k * mu ** 2) / k
+        beta = min(beta, delta)
+        shrinkage = 0.0 if beta == 0 else beta / delta
+        return (1 - shrinkage) * emp_cov + shrinkage * mu * np.eye(k)
+
+
+class CovarianceService:
+    """Running moments per (store version, frequency) and the estimates read from them.
+
+    A newly published version derives its moments from its parent's by adding
+    and removing the bars that changed, so ingesting new bars costs
+    O(changed bars * K^2) rather than O(T * K^2). Estimates are memoised, so
+    repeated reads are a dict lookup.
+    """
+
+    def __init__(self):
+        self._moments: Dict[tuple, RunningMoments] = {}
+        self._estimates: Dict[tuple, Estimates] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parent(version: PriceStoreVersion) -> Optional[PriceStoreVersion]:
+        if version.parent_id is None:
+            return None
+        try:
+            return price_store.get(version.parent_id)
+        except KeyError:
+            return None
+
+    def _derive(self, version: PriceStoreVersion, freq: str) -> RunningMoments:
+        returns = version.returns(freq)
+        parent = self._parent(version)
+        if parent is not None:
+            with self._lock:
+                parent_moments = self._moments.get(parent.cache_key(freq))
+            if parent_moments is not None:
+                moments = parent_moments.update(parent.returns(freq), returns)
+                if moments is not None:
+                    return moments
+        return RunningMoments.build(returns, EWMA_DECAY[freq])
+
+    def moments(self, version: PriceStoreVersion, freq: str = DEFAULT_FREQ) -> RunningMoments:
+        key = version.cache_key(freq)
+        with self._lock:
+            if key in self._moments:
+                return self._moments[key]
+        moments = self._derive(version, freq)
+        with self._lock:
+            return self._moments.setdefault(key, moments)
+
+    def estimates(self, version: PriceStoreVersion, freq: str = DEFAULT_FREQ, method: str = "sample") -> Estimates:
+        if method not in METHODS:
+            raise ValueError(f"Unknown covariance method: {method}")
+        key = version.cache_key(freq, method)
+        with self._lock:
+            if key in self._estimates:
+                return self._estimates[key]
+        moments = self.moments(version, freq)
+        cov = {"sample": moments.sample, "ewma": moments.ewma_cov, "ledoit_wolf": moments.ledoit_wolf}[method]()
+        estimates = Estimates(columns=moments.columns, mu=moments.mean, cov=cov, n=moments.n)
+        with self._lock:
+            return self._estimates.setdefault(key, estimates)
+
+    def on_publish(self, version: PriceStoreVersion) -> None:
+        """Roll forward every frequency already tracked for the parent version."""
+        parent = self._parent(version)
+        if parent is None:
+            return
+        with self._lock:
+            freqs = [key[1] for key in self._moments if key[0] == parent.content_hash]
+        for freq in freqs:
+            self.moments(version, freq)
+
+    def drop_version(self, version: PriceStoreVersion) -> None:
+        with self._lock:
+            for cache in (self._moments, self._estimates):
+                for key in [key for key in cache if key[0] == version.content_hash]:
+                    del cache[key]
+
+
+covariance_service = CovarianceService()
+price_store.on_publish(covariance_service.on_publish)
+price_store.on_collect(covariance_service.drop_version)
+
+
+def get_estimates(version: PriceStoreVersion, freq: str = DEFAULT_FREQ, method: str = "sample") -> Estimates:
+    """Expected returns and a sample, EWMA or Ledoit-Wolf covariance of the store returns."""
+    return covariance_service.estimates(version, freq, method)
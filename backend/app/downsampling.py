@@ -0,0 +1,82 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of ``n_out`` points that preserve the shape of y(x).
+
+    The first and last points are always kept; each bucket in between keeps the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket. Bucket averages are precomputed in one pass and
+    each bucket is scored with a vectorised area computation.
+    """
+    n = len(y)
+    if n_out < 3:
+        raise ValueError(f"LTTB keeps at least 3 points, got {n_out}")
+    if n_out >= n:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    bounds = np.linspace(1, n - 1, n_out - 1).astype(int)     # bucket i is [bounds[i], bounds[i + 1])
+    counts = np.diff(bounds)
+    avg_x = np.add.reduceat(x[1:n - 1], bounds[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], bounds[:-1] - 1) / counts
+    avg_x = np.append(avg_x[1:], x[-1])                        # "next bucket" of the last one is the last point
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the min and max of each of ``n_out // 2`` equal buckets, plus both endpoints.
+
+    With ``n_out`` = 3 only the point furthest from the endpoints' mean joins them.
+    """
+    n = len(y)
+    if n_out < 3:
+        raise ValueError(f"Min-max keeps at least 3 points, got {n_out}")
+    if n_out >= n:
+        return np.arange(n)
+    if n_out == 3:
+        return np.unique([0, int(np.argmax(np.abs(y - (y[0] + y[-1]) / 2))), n - 1])
+    n_buckets = (n_out - 2) // 2
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    picked = np.concatenate([[0, n - 1], offsets + np.nanargmin(buckets, axis=1), offsets + np.nanargmax(buckets, axis=1)])
+    return np.unique(picked)
+
+
+METHODS = ("lttb", "minmax")
+
+
+def downsample_points(points: List[dict], max_points: int, method: str = "lttb") -> List[dict]:
+    """Downsample a [{'date': ..., 'value': ...}] chart series to at most ``max_points`` (>= 3) points."""
+    if max_points is not None and max_points < 3:
+        raise ValueError(f"max_points must be at least 3, got {max_points}")
+    if max_points is None or len(points) <= max_points:
+        return points
+    y = np.fromiter((point['value'] for point in points), dtype=np.float64, count=len(points))
+    if method == "minmax":
+        keep = minmax(y, max_points)
+    elif method == "lttb":
+        x = pd.DatetimeIndex([point['date'] for point in points]).asi8.astype(np.float64)
+        keep = lttb(x, y, max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return [points[i] for i in keep]
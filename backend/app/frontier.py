@@ -0,0 +1,188 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.price_store import DEFAULT_FREQ, PERIODS_PER_YEAR, PriceStoreVersion, price_store
+
+
+FRONTIER_DIR = os.getenv("FRONTIER_DIR", "./app/files/frontiers")
+FRONTIER_POINTS = int(os.getenv("FRONTIER_POINTS", 50))
+RISK_MEASURES = ("MV", "CVaR")
+CVAR_ALPHA = 0.05
+
+
+@dataclass
+class Frontier:
+    """Efficient frontier sorted by risk, with the estimates it was solved with (per period)."""
+
+    risk_measure: str
+    freq: str
+    columns: list
+    weights: np.ndarray      # (P, K)
+    risk: np.ndarray         # (P,)
+    ret: np.ndarray          # (P,)
+    mu: np.ndarray           # (K,)
+    cov: np.ndarray          # (K, K)
+
+    @property
+    def periods(self) -> int:
+        return PERIODS_PER_YEAR[self.freq]
+
+    @property
+    def risk_scale(self) -> float:
+        """Annualisation factor of the risk: sqrt(periods) for volatility, 1 for CVaR (a per-period loss)."""
+        return self.periods ** 0.5 if self.risk_measure == "MV" else 1.0
+
+    def nearest(self, target_risk: float) -> int:
+        """Index of the frontier portfolio whose risk is closest to ``target_risk`` (per period)."""
+        i = int(np.clip(np.searchsorted(self.risk, target_risk), 1, len(self.risk) - 1))
+        return i if abs(self.risk[i] - target_risk) < abs(self.risk[i - 1] - target_risk) else i - 1
+
+    def distance(self, risk: float, ret: float) -> dict:
+        """Return shortfall at equal risk and risk excess at equal return versus the frontier."""
+        frontier_ret = np.interp(risk, self.risk, self.ret)
+        frontier_risk = np.interp(ret, self.ret, self.risk)
+        return {"return_gap": float(frontier_ret - ret), "risk_gap": float(risk - frontier_risk)}
+
+
+def portfolio_risk(weights: np.ndarray, risk_measure: str, cov: np.ndarray, returns: np.ndarray) -> np.ndarray:
+    """Per-period risk of (P, K) weights: volatility for MV, historical CVaR for CVaR."""
+    if risk_measure == "MV":
+        return np.sqrt(np.einsum("pk,kl,pl->p", weights, cov, weights))
+    losses = -(returns @ weights.T)                                # (T, P)
+    var = np.quantile(losses, 1 - CVAR_ALPHA, axis=0)
+    return np.where(losses >= var, losses, 0).sum(axis=0) / np.maximum((losses >= var).sum(axis=0), 1)
+
+
+def compute_frontier(returns: pd.DataFrame, risk_measure: str, freq: str, points: int = FRONTIER_POINTS) -> Frontier:
+    """Solve the frontier with riskfolio (runs in a worker process)."""
+    import riskfolio as rp
+
+    port = rp.Portfolio(returns=returns)
+    port.assets_stats(method_mu="hist", method_cov="hist")
+    port.alpha = CVAR_ALPHA
+    weights = port.efficient_frontier(model="Classic", rm=risk_measure, points=points, rf=0, hist=True)
+    weights = weights.to_numpy().T
+    mu = port.mu.to_numpy().ravel()
+    cov = port.cov.to_numpy()
+    risk = portfolio_risk(weights, risk_measure, cov, returns.to_numpy())
+    order = np.argsort(risk)
+    return Frontier(
+        risk_measure=risk_measure,
+        freq=freq,
+        columns=list(returns.columns),
+        weights=weights[order],
+        risk=risk[order],
+        ret=(weights @ mu)[order],
+        mu=mu,
+        cov=cov,
+    )
+
+
+class FrontierService:
+    """Frontiers per (store version, frequency, risk measure), solved once in a background process.
+
+    Results are kept in memory and persisted under FRONTIER_DIR by content
+    hash, so a restart on the same prices does not solve again. ``get`` never
+    blocks on a solve: it returns None and schedules one if needed.
+    """
+
+    def __init__(self, directory: str = FRONTIER_DIR):
+        self.directory = directory
+        self._frontiers: Dict[tuple, Frontier] = {}
+        self._pending: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _path(self, key: tuple) -> str:
+        content_hash, freq, risk_measure = key
+        return os.path.join(self.directory, f"{content_hash}_{freq}_{risk_measure}.npz")
+
+    def _load(self, key: tuple) -> Optional[Frontier]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return Frontier(
+                risk_measure=key[2],
+                freq=key[1],
+                columns=data["columns"].tolist(),
+                weights=data["weights"],
+                risk=data["risk"],
+                ret=data["ret"],
+                mu=data["mu"],
+                cov=data["cov"],
+            )
+
+    def _save(self, key: tuple, frontier: Frontier) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        np.savez(
+            self._path(key),
+            columns=np.array(frontier.columns),
+            weights=frontier.weights,
+            risk=frontier.risk,
+            ret=frontier.ret,
+            mu=frontier.mu,
+            cov=frontier.cov,
+        )
+
+    def _done(self, key: tuple, future: Future) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.exception() is not None:
+                return
+            self._frontiers[key] = future.result()
+        self._save(key, future.result())
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def schedule(self, version: PriceStoreVersion, freq: str = DEFAULT_FREQ, risk_measure: str = "MV") -> None:
+        key = version.cache_key(freq, risk_measure)
+        with self._lock:
+            if key in self._frontiers or key in self._pending:
+                return
+            frontier = self._load(key)
+            if frontier is not None:
+                self._frontiers[key] = frontier
+                return
+            try:
+                future = self._get_executor().submit(compute_frontier, version.returns(freq), risk_measure, freq)
+            except BrokenProcessPool:
+                # A crashed worker poisons the pool; start a fresh one.
+                self._executor = None
+                future = self._get_executor().submit(compute_frontier, version.returns(freq), risk_measure, freq)
+            self._pending[key] = future
+        future.add_done_callback(lambda f: self._done(key, f))
+
+    def schedule_all(self, version: PriceStoreVersion) -> None:
+        for risk_measure in RISK_MEASURES:
+            self.schedule(version, DEFAULT_FREQ, risk_measure)
+
+    def get(self, version: PriceStoreVersion, freq: str = DEFAULT_FREQ, risk_measure: str = "MV") -> Optional[Frontier]:
+        key = version.cache_key(freq, risk_measure)
+        with self._lock:
+            if key in self._frontiers:
+                return self._frontiers[key]
+        self.schedule(version, freq, risk_measure)
+        with self._lock:
+            return self._frontiers.get(key)
+
+    def drop_version(self, version: PriceStoreVersion) -> None:
+        with self._lock:
+            for key in [key for key in self._frontiers if key[0] == version.content_hash]:
+                del self._frontiers[key]
+
+
+frontier_service = FrontierService()
+price_store.on_publish(frontier_service.schedule_all)
+price_store.on_collect(frontier_service.drop_version)
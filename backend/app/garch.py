@@ -0,0 +1,190 @@
+import multiprocessing
+import os
+import threading
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.price_store import PERIODS_PER_YEAR, PriceStoreVersion, price_store
+
+
+GARCH_FREQ = "D"
+GARCH_WORKERS = int(os.getenv("GARCH_WORKERS", min(4, os.cpu_count() or 1)))
+
+# arch works best on percentage returns.
+SCALE = 100.0
+
+
+@dataclass
+class GarchFit:
+    """GARCH(1,1) parameters of one asset (percentage returns) and its state at the last bar."""
+
+    params: np.ndarray       # mu, omega, alpha, beta
+    next_variance: float     # one-step-ahead conditional variance
+    std_resid: np.ndarray    # (T,) standardised residuals, for the constant correlation
+    converged: bool
+
+    def variance_path(self, horizon: int) -> np.ndarray:
+        """Expected conditional variance of the next ``horizon`` bars (percentage units)."""
+        _, omega, alpha, beta = self.params
+        persistence = alpha + beta
+        steps = persistence ** np.arange(horizon)
+        if persistence >= 1:
+            return self.next_variance + omega * np.arange(horizon)
+        long_run = omega / (1 - persistence)
+        return long_run + (self.next_variance - long_run) * steps
+
+
+def sample_variance_fit(returns: np.ndarray, converged: bool = True) -> GarchFit:
+    """Constant-variance stand-in for a GARCH fit: alpha = beta = 0, omega the sample variance."""
+    y = returns * SCALE
+    variance = max(float(y.var()), 1e-12)
+    std_resid = (y - y.mean()) / np.sqrt(variance) if y.std() >= 1e-4 else np.zeros_like(y)
+    return GarchFit(np.array([y.mean(), variance, 0.0, 0.0]), variance, std_resid, converged)
+
+
+def fit_garch(returns: np.ndarray, starting_values: Optional[np.ndarray] = None) -> GarchFit:
+    """Fit a constant-mean GARCH(1,1) by MLE (runs in a worker process).
+
+    Series too flat to fit (e.g. cash) fall back to their sample variance.
+    """
+    from arch import arch_model
+
+    y = returns * SCALE
+    if y.std() < 1e-4:
+        return sample_variance_fit(returns)
+    model = arch_model(y, mean="Constant", vol="GARCH", p=1, q=1, rescale=False)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        result = model.fit(starting_values=starting_values, disp="off", show_warning=False)
+    mu, omega, alpha, beta = result.params.to_numpy()
+    resid = y[-1] - mu
+    next_variance = omega + alpha * resid ** 2 + beta * result.conditional_volatility[-1] ** 2
+    return GarchFit(
+        params=result.params.to_numpy(),
+        next_variance=float(next_variance),
+        std_resid=np.nan_to_num(np.asarray(result.std_resid)),
+        converged=result.convergence_flag == 0,
+    )
+
+
+@dataclass
+class GarchForecast:
+    columns: list
+    volatility: np.ndarray      # (K,) annualised volatility over the horizon
+    correlation: np.ndarray     # (K, K) constant conditional correlation
+    periods: int
+
+    def portfolio_volatility(self, weights: np.ndarray) -> np.ndarray:
+        """Annualised volatility of (K,) or (N, K) weights: sqrt(w' D R D w)."""
+        scaled = np.atleast_2d(weights) * self.volatility
+        return np.sqrt(np.einsum("nk,kl,nl->n", scaled, self.correlation, scaled))
+
+
+class GarchService:
+    """Per-asset GARCH(1,1) fits per store version, run in a background process pool.
+
+    Every asset is fitted as its own task, warm-started from the last
+    parameters fitted for that ticker, so a refresh converges in a few
+    iterations. ``forecast`` never blocks on a fit: it returns None and
+    schedules the fits if needed. An asset whose fit fails (or whose worker
+    crashes) gets its sample variance instead, marked not converged, so the
+    version is not refitted on every request.
+    """
+
+    def __init__(self, workers: int = GARCH_WORKERS):
+        self.workers = workers
+        self._fits: Dict[tuple, Dict[str, GarchFit]] = {}
+        self._pending: Dict[tuple, Dict[str, Future]] = {}
+        self._last_params: Dict[str, np.ndarray] = {}
+        self._forecasts: Dict[tuple, GarchForecast] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _submit(self, returns: np.ndarray, starting_values) -> Future:
+        try:
+            return self._get_executor().submit(fit_garch, returns, starting_values)
+        except BrokenProcessPool:
+            # A crashed worker poisons the pool; start a fresh one.
+            self._executor = None
+            return self._get_executor().submit(fit_garch, returns, starting_values)
+
+    def _done(self, key: tuple, ticker: str, returns: np.ndarray, future: Future) -> None:
+        fit = sample_variance_fit(returns, converged=False) if future.exception() is not None else future.result()
+        with self._lock:
+            pending = self._pending.get(key, {})
+            pending.pop(ticker, None)
+            self._fits.setdefault(key, {})[ticker] = fit
+            if future.exception() is None:
+                self._last_params[ticker] = fit.params
+            if not pending:
+                self._pending.pop(key, None)
+
+    def schedule(self, version: PriceStoreVersion) -> None:
+        key = version.cache_key("garch", GARCH_FREQ)
+        returns = version.returns(GARCH_FREQ)
+        with self._lock:
+            if key in self._pending or len(self._fits.get(key, {})) == returns.shape[1]:
+                return
+            fitted = self._fits.get(key, {})
+            series = {ticker: returns[ticker].to_numpy(dtype=np.float64) for ticker in returns.columns if ticker not in fitted}
+            futures = {ticker: self._submit(y, self._last_params.get(ticker)) for ticker, y in series.items()}
+            self._pending[key] = dict(futures)
+        for ticker, future in futures.items():
+            future.add_done_callback(lambda f, ticker=ticker: self._done(key, ticker, series[ticker], f))
+
+    def fits(self, version: PriceStoreVersion) -> Optional[Dict[str, GarchFit]]:
+        """All per-asset fits of a version, or None (scheduling them) while any is missing."""
+        key = version.cache_key("garch", GARCH_FREQ)
+        columns = version.prices.columns
+        with self._lock:
+            fits = self._fits.get(key, {})
+            if all(ticker in fits for ticker in columns):
+                return fits
+        self.schedule(version)
+        return None
+
+    def forecast(self, version: PriceStoreVersion, horizon: int = 1) -> Optional[GarchForecast]:
+        """Asset volatilities over the next ``horizon`` bars and their CCC correlation."""
+        key = version.cache_key("garch", GARCH_FREQ, horizon)
+        with self._lock:
+            if key in self._forecasts:
+                return self._forecasts[key]
+        fits = self.fits(version)
+        if fits is None:
+            return None
+        columns = list(version.prices.columns)
+        variance = np.array([fits[ticker].variance_path(horizon).mean() for ticker in columns]) / SCALE ** 2
+        residuals = np.column_stack([fits[ticker].std_resid for ticker in columns])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            correlation = np.nan_to_num(np.corrcoef(residuals, rowvar=False))
+        np.fill_diagonal(correlation, 1.0)
+        periods = PERIODS_PER_YEAR[GARCH_FREQ]
+        forecast = GarchForecast(
+            columns=columns,
+            volatility=np.sqrt(variance * periods),
+            correlation=correlation,
+            periods=periods,
+        )
+        with self._lock:
+            return self._forecasts.setdefault(key, forecast)
+
+    def drop_version(self, version: PriceStoreVersion) -> None:
+        with self._lock:
+            for cache in (self._fits, self._forecasts):
+                for key in [key for key in cache if key[0] == version.content_hash]:
+                    del cache[key]
+
+
+garch_service = GarchService()
+price_store.on_publish(garch_service.schedule)
+price_store.on_collect(garch_service.drop_version)
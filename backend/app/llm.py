@@ -0,0 +1,333 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional, Protocol
+
+import requests
+
+from app.allocation_parser import NO_INFO
+
+# Provider used by the routes: "gemini", "http" or "stub".
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+LLM_HTTP_URL = os.getenv("LLM_HTTP_URL")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+# Stub latency distribution, see latency_sampler.
+LLM_STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "fixed:0")
+
+# Latency budget of one LLM reply: a duplicate (hedged) call is issued once the
+# first has run longer than this percentile of recent call latencies, and the
+# caller falls back to a deterministic allocation at the deadline.
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", 8.0))
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 0.95))
+# Hedge delay until LLM_HEDGE_MIN_SAMPLES latencies have been observed.
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", 3.0))
+LLM_HEDGE_MIN_SAMPLES = 20
+# Concurrent first calls, hedged calls, and calls still running after their
+# request gave up (they end by LLM_TIMEOUT). Each has its own bound, so calls
+# to a hung backend cannot take the workers of new requests.
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", 32))
+LLM_HEDGE_WORKERS = int(os.getenv("LLM_HEDGE_WORKERS", 8))
+LLM_ABANDONED_WORKERS = int(os.getenv("LLM_ABANDONED_WORKERS", 32))
+
+
+class LLMProvider(Protocol):
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        """Reply text for ``prompt``; JSON following ``schema`` when one is given."""
+
+
+class GeminiProvider:
+    def __init__(self, api_key: Optional[str] = None, model: str = LLM_MODEL, timeout: float = LLM_TIMEOUT):
+        self.api_key = api_key if api_key is not None else os.getenv("LLM_API_KEY")
+        self.model = model
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Gemini client, created on first use (google-genai is slow to import)."""
+        with self._lock:
+            if self._client is None:
+                from google import genai
+
+                self._client = genai.Client(api_key=self.api_key, http_options={"timeout": int(self.timeout * 1000)})
+        return self._client
+
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        config = {"response_mime_type": "application/json", "response_schema": schema} if schema else None
+        response = self.client.models.generate_content(
+            model=self.model, contents=urllib.parse.quote(prompt), config=config
+        )
+        return response.text
+
+
+class HTTPProvider:
+    """Generic endpoint taking ``query`` (and ``schema``) and answering ``{"content": ...}``."""
+
+    def __init__(self, url: str, timeout: float = LLM_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        response = requests.post(
+            self.url,
+            params={"query": prompt},
+            json={"schema": schema} if schema else None,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()["content"]
+
+
+def latency_sampler(spec: str, seed: Optional[int] = None) -> Callable[[], float]:
+    """
+    Seconds-per-call sampler from a spec such as ``fixed:0.5``,
+    ``uniform:0.2,1.5``, ``lognormal:-0.5,0.4`` (mu, sigma of the log) or
+    ``pareto:0.3,2.5`` (scale, shape; heavy tail).
+    """
+    kind, _, args = spec.partition(":")
+    params = [float(arg) for arg in args.split(",") if arg]
+    rng = random.Random(seed)
+    samplers = {
+        "fixed": lambda value=0.0: lambda: value,
+        "uniform": lambda low, high: lambda: rng.uniform(low, high),
+        "lognormal": lambda mu, sigma: lambda: rng.lognormvariate(mu, sigma),
+        "pareto": lambda scale, shape: lambda: scale * rng.paretovariate(shape),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution: {kind}")
+    return samplers[kind](*params)
+
+
+# Asset-class split per risk profile for the stub (equity, bonds, alternatives, cash).
+STUB_TEMPLATES = {
+    "conservative": (0.20, 0.60, 0.05, 0.15),
+    "moderately conservative": (0.35, 0.50, 0.05, 0.10),
+    "balanced": (0.50, 0.35, 0.10, 0.05),
+    "moderately aggressive": (0.65, 0.20, 0.15, 0.00),
+    "aggressive": (0.80, 0.05, 0.15, 0.00),
+}
+_PROFILE_WORDS = (
+    ("conservative", ("retire", "pension", "safe", "capital protection", "cannot lose")),
+    ("aggressive", ("aggressive", "crypto", "bitcoin", "high risk", "speculat")),
+    ("moderately aggressive", ("growth", "long term", "young")),
+)
+_GOAL_WORDS = (
+    ("retirement", ("retire", "pension")),
+    ("home purchase", ("house", "home", "mortgage")),
+    ("education", ("education", "college", "university", "school")),
+    ("income", ("income", "dividend")),
+)
+_TAG = re.compile(r"<tag>(.*?)</tag>", re.S)
+
+
+def asset_class(label: str) -> int:
+    """Index into a STUB_TEMPLATES split for an asset label."""
+    if "Bond" in label or "Inflation" in label:
+        return 1
+    if label in ("Bitcoin", "Gold", "Silver", "Crude Oil") or "Real Estate" in label:
+        return 2
+    if "Cash" in label:
+        return 3
+    return 0
+
+
+def rule_based_advice(text: str, labels) -> dict:
+    """
+    Deterministic advice for a client text: risk profile and goal from
+    keywords, weights from the profile's STUB_TEMPLATES split spread evenly
+    within each asset class. Same shape as the ``advice_schema`` reply.
+    """
+    text = text.lower()
+    profile = next((p for p, words in _PROFILE_WORDS if any(w in text for w in words)), "balanced")
+    goal = next((g for g, words in _GOAL_WORDS if any(w in text for w in words)), "wealth growth")
+
+    classes = [asset_class(label) for label in labels]
+    split = STUB_TEMPLATES[profile]
+    present = [split[c] if c in classes else 0 for c in range(len(split))]
+    scale = sum(present) or 1
+    weights = {label: present[c] / scale / classes.count(c) for label, c in zip(labels, classes)}
+
+    summary = NO_INFO if len(text.split()) < 5 else f"{profile.capitalize()} risk profile, saving for {goal}."
+    return {"summary": summary, "risk_profile": profile, "goal": goal, "weights": weights}
+
+
+class StubProvider:
+    """
+    Offline, deterministic provider for load tests and CI.
+
+    Returns ``reply`` verbatim when given, otherwise ``rule_based_advice`` for
+    the client text inside ``<tag>``: the same prompt always gets the same
+    reply. Each call sleeps for a draw from ``latency``.
+    """
+
+    def __init__(self, latency: str = LLM_STUB_LATENCY, reply: Optional[str] = None, seed: Optional[int] = 0):
+        self.sample_latency = latency_sampler(latency, seed)
+        self.reply = reply
+
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        time.sleep(self.sample_latency())
+        if self.reply is not None:
+            return self.reply
+        match = _TAG.search(prompt)
+        labels = (schema or {}).get("properties", {}).get("weights", {}).get("property_ordering", [])
+        return json.dumps(rule_based_advice(match.group(1) if match else prompt, labels))
+
+
+@lru_cache(maxsize=None)
+def get_provider() -> LLMProvider:
+    """Provider selected by LLM_PROVIDER; a FastAPI dependency, override it in tests and benchmarks."""
+    if LLM_PROVIDER == "gemini":
+        return GeminiProvider()
+    if LLM_PROVIDER == "http":
+        if not LLM_HTTP_URL:
+            raise RuntimeError("LLM_PROVIDER=http needs LLM_HTTP_URL")
+        return HTTPProvider(LLM_HTTP_URL)
+    if LLM_PROVIDER == "stub":
+        return StubProvider()
+    raise RuntimeError(f"Unknown LLM_PROVIDER: {LLM_PROVIDER}")
+
+
+@dataclass
+class BudgetedReply:
+    text: Optional[str]          # None when no call succeeded before the deadline
+    hedged: bool
+    error: Optional[str] = None  # why there is no text
+
+
+class _Slot:
+    """The worker slot (a semaphore) a provider call holds until it completes."""
+
+    def __init__(self, semaphore: threading.Semaphore):
+        self._semaphore = semaphore
+        self._lock = threading.Lock()
+
+    def move(self, semaphore: threading.Semaphore) -> None:
+        """Hold a slot of ``semaphore`` instead, if the call still runs and one is free."""
+        with self._lock:
+            if self._semaphore is not None and semaphore.acquire(blocking=False):
+                self._semaphore.release()
+                self._semaphore = semaphore
+
+    def release(self, future: Optional[Future] = None) -> None:
+        with self._lock:
+            if self._semaphore is not None:
+                self._semaphore.release()
+                self._semaphore = None
+
+
+class LatencyBudget:
+    """
+    Runs provider calls on a thread pool under a deadline, hedging slow calls.
+
+    Latencies of every completed call, including ones that finished after
+    their request gave up, feed the window the hedge percentile is read from.
+    Abandoned calls cannot be interrupted; they run to completion (bounded by
+    the provider timeout) in ``abandoned_workers`` slots of their own, keeping
+    their first-call or hedge slot only while those are all taken. A hedge is
+    skipped rather than queued when the ``hedge_workers`` slots are busy.
+    """
+
+    def __init__(
+        self,
+        deadline: float = LLM_DEADLINE,
+        percentile: float = LLM_HEDGE_PERCENTILE,
+        hedge_after: float = LLM_HEDGE_AFTER,
+        window: int = 256,
+        workers: int = LLM_WORKERS,
+        hedge_workers: int = LLM_HEDGE_WORKERS,
+        abandoned_workers: int = LLM_ABANDONED_WORKERS,
+    ):
+        self.deadline = deadline
+        self.percentile = percentile
+        self.hedge_after = hedge_after
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._first = threading.Semaphore(workers)
+        self._hedge = threading.Semaphore(hedge_workers)
+        self._abandoned = threading.Semaphore(abandoned_workers)
+        # A thread per slot: a call holding a slot never queues.
+        self._executor = ThreadPoolExecutor(max_workers=workers + hedge_workers + abandoned_workers, thread_name_prefix="llm")
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return self.hedge_after
+        return latencies[min(len(latencies) - 1, int(self.percentile * len(latencies)))]
+
+    def _timed(self, provider: LLMProvider, prompt: str, schema: Optional[dict]) -> str:
+        start = time.perf_counter()
+        text = provider.generate(prompt, schema)
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+        return text
+
+    def _submit(self, slot: _Slot, provider: LLMProvider, prompt: str, schema: Optional[dict]) -> Future:
+        future = self._executor.submit(self._timed, provider, prompt, schema)
+        future.add_done_callback(slot.release)
+        return future
+
+    def generate(self, provider: LLMProvider, prompt: str, schema: Optional[dict] = None) -> BudgetedReply:
+        """
+        First successful reply of the call and its hedge, or no text once
+        ``deadline`` seconds have passed or both calls have failed. A call that
+        fails before the hedge delay is hedged right away.
+        """
+        start = time.monotonic()
+        # The hedge delay tracks recent latencies, abandoned calls included, so
+        # it can exceed the deadline; neither it nor any wait may run past it.
+        hedge_at = start + min(self.hedge_delay(), self.deadline)
+        deadline = start + self.deadline
+        if not self._first.acquire(timeout=self.deadline):
+            return BudgetedReply(text=None, hedged=False, error=f"no free LLM worker within {self.deadline:g}s")
+        slot = _Slot(self._first)
+        slots = {self._submit(slot, provider, prompt, schema): slot}
+        pending = set(slots)
+        hedged = hedge_tried = False
+        error = None
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if not hedge_tried and (now >= hedge_at or not pending):
+                hedge_tried = True
+                if self._hedge.acquire(blocking=False):
+                    slot = _Slot(self._hedge)
+                    future = self._submit(slot, provider, prompt, schema)
+                    slots[future] = slot
+                    pending.add(future)
+                    hedged = True
+            if not pending:
+                break
+            target = deadline if hedge_tried else min(hedge_at, deadline)
+            done, pending = wait(pending, timeout=target - now, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    continue
+                self._abandon(pending, slots)
+                return BudgetedReply(text=text, hedged=hedged)
+        self._abandon(pending, slots)
+        if pending or error is None:
+            error = f"no reply within {self.deadline:g}s"
+        return BudgetedReply(text=None, hedged=hedged, error=error)
+
+    def _abandon(self, pending, slots: dict) -> None:
+        """Move calls the request no longer waits for to the abandoned slots."""
+        for future in pending:
+            slots[future].move(self._abandoned)
+
+
+latency_budget = LatencyBudget()
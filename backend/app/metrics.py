@@ -0,0 +1,288 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+# Inputs supplied by the caller; every other node is derived from them.
+SEEDS = ("values", "index", "rf", "periods", "benchmark", "tail")
+
+
+@dataclass(frozen=True)
+class Node:
+    inputs: Tuple[str, ...]
+    fn: Callable
+    public: bool
+
+
+_NODES: Dict[str, Node] = {}
+
+
+def _register(name: str, inputs: Tuple[str, ...], public: bool):
+    def decorator(fn):
+        _NODES[name] = Node(inputs=inputs, fn=fn, public=public)
+        return fn
+    return decorator
+
+
+def intermediate(name: str, *inputs: str):
+    """Register a shared intermediate (e.g. sorted returns) computed from ``inputs``."""
+    return _register(name, inputs, public=False)
+
+
+def metric(name: str, *inputs: str):
+    """Register a reported metric computed from ``inputs`` (seeds, intermediates or other metrics)."""
+    return _register(name, inputs, public=True)
+
+
+class MetricContext:
+    """Lazily evaluates nodes on demand; each one is computed at most once per context."""
+
+    def __init__(self, **seeds):
+        self._values = {name: value for name, value in seeds.items() if value is not None}
+
+    def missing(self, name: str) -> set:
+        """Seeds that ``name`` needs but were not supplied."""
+        if name in self._values:
+            return set()
+        if name not in _NODES:
+            return {name}
+        return set().union(*(self.missing(i) for i in _NODES[name].inputs))
+
+    def __getitem__(self, name: str):
+        if name not in self._values:
+            node = _NODES[name]
+            self._values[name] = node.fn(*(self[i] for i in node.inputs))
+        return self._values[name]
+
+
+def available_metrics() -> list:
+    return [name for name, node in _NODES.items() if node.public]
+
+
+def evaluate(names: Optional[Iterable[str]] = None, dtype=None, **seeds) -> dict:
+    """
+    Compute the named metrics, sharing intermediates and skipping everything else.
+
+    Args:
+        names (Iterable[str]): Metrics to compute; by default every metric
+            whose seeds were supplied (e.g. Calmar needs ``index``, Alpha
+            needs ``benchmark``).
+        dtype: Compute dtype; defaults to the dtype of ``values``.
+        **seeds: ``values`` (T,) or (T, N) plus optional ``index``, ``rf``,
+            ``periods``, ``benchmark`` and ``tail``.
+
+    Returns:
+        dict: Metric name -> float, or ndarray of shape (N,) for a batch.
+    """
+    values = np.asarray(seeds.pop("values"))
+    values = values.astype(dtype or (values.dtype if values.dtype.kind == "f" else np.float64), copy=False)
+    context = MetricContext(values=values, **seeds)
+
+    if names is None:
+        names = [name for name in available_metrics() if not context.missing(name)]
+    names = list(names)
+    for name in names:
+        if name not in _NODES or not _NODES[name].public:
+            raise ValueError(f"Unknown metric: {name}")
+        if context.missing(name):
+            raise ValueError(f"{name} needs {', '.join(sorted(context.missing(name)))}")
+
+    metrics = {name: context[name] for name in names}
+    if values.ndim == 1:
+        return {name: float(value) for name, value in metrics.items()}
+    return metrics
+
+
+# Intermediates ---------------------------------------------------------------
+
+@intermediate("returns", "values")
+def _returns(values):
+    returns = np.zeros_like(values)
+    returns[1:] = values[1:] / values[:-1] - 1
+    returns[~np.isfinite(returns)] = 0
+    return returns
+
+
+@intermediate("log_returns", "returns")
+def _log_returns(returns):
+    return np.log1p(returns)
+
+
+@intermediate("excess", "returns", "rf", "periods")
+def _excess(returns, rf, periods):
+    return returns - ((1 + rf) ** (1.0 / periods) - 1)
+
+
+@intermediate("wealth", "returns")
+def _wealth(returns):
+    return np.cumprod(1 + returns, axis=0)
+
+
+@intermediate("drawdown", "wealth")
+def _drawdown(wealth):
+    return wealth / np.maximum.accumulate(wealth, axis=0) - 1
+
+
+@intermediate("moments", "returns")
+def _moments(returns):
+    """Mean and biased central moments m2, m3, m4."""
+    mean = returns.mean(axis=0)
+    centered = returns - mean
+    return mean, (centered ** 2).mean(axis=0), (centered ** 3).mean(axis=0), (centered ** 4).mean(axis=0)
+
+
+@intermediate("shape", "moments")
+def _shape(moments):
+    """Biased skew g1 and excess kurtosis g2."""
+    _, m2, m3, m4 = moments
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return m3 / m2 ** 1.5, m4 / m2 ** 2 - 3
+
+
+@intermediate("sorted_returns", "returns")
+def _sorted_returns(returns):
+    return np.sort(returns, axis=0)
+
+
+@intermediate("period_returns", "returns")
+def _period_returns(returns):
+    return returns[1:]
+
+
+@intermediate("benchmark_returns", "benchmark", "period_returns")
+def _benchmark_returns(benchmark, period_returns):
+    """Benchmark returns aligned with ``period_returns`` (the first one is ignored)."""
+    bench = np.asarray(benchmark, dtype=period_returns.dtype)[1:]
+    return bench[:, None] if period_returns.ndim == 2 else bench
+
+
+@intermediate("active", "period_returns", "benchmark_returns")
+def _active(period_returns, bench):
+    return period_returns - bench
+
+
+def cornish_fisher_quantile(p, mean, std, skew, kurt):
+    """Quantile at probability ``p`` of a distribution with these moments (kurt is excess kurtosis)."""
+    from scipy.special import ndtri
+
+    z = np.asarray(ndtri(p), dtype=np.result_type(mean))
+    z_cf = z + (z ** 2 - 1) * skew / 6 + (z ** 3 - 3 * z) * kurt / 24 - (2 * z ** 3 - 5 * z) * skew ** 2 / 36
+    return mean + z_cf * std
+
+
+# Metrics ---------------------------------------------------------------------
+# Conventions follow quantstats/empyrical (see stats.compute_core_metrics).
+
+@metric("Sharpe Ratio", "excess", "periods")
+def _sharpe(excess, periods):
+    return excess.mean(axis=0) / excess.std(axis=0, ddof=1) * periods ** 0.5
+
+
+@metric("Sortino Ratio", "excess", "periods")
+def _sortino(excess, periods):
+    downside = np.sqrt((np.minimum(excess, 0) ** 2).sum(axis=0) / excess.shape[0])
+    return excess.mean(axis=0) / downside * periods ** 0.5
+
+
+@metric("Maximum Drawdown", "drawdown")
+def _max_drawdown(drawdown):
+    return drawdown.min(axis=0)
+
+
+@metric("Total Return", "wealth")
+def _total_return(wealth):
+    return wealth[-1] - 1
+
+
+@metric("Value at Risk", "sorted_returns", "tail")
+def _value_at_risk(ordered, tail):
+    """Historical VaR: linear-interpolated quantile."""
+    n = ordered.shape[0]
+    position = tail * (n - 1)
+    lower = int(position)
+    return ordered[lower] + (position - lower) * (ordered[min(lower + 1, n - 1)] - ordered[lower])
+
+
+@metric("Conditional Value at Risk", "sorted_returns", "Value at Risk")
+def _conditional_value_at_risk(ordered, var):
+    """Historical CVaR: mean of the returns at or below the VaR."""
+    in_tail = ordered <= var
+    return np.where(in_tail, ordered, 0).sum(axis=0) / in_tail.sum(axis=0)
+
+
+@metric("Cornish-Fisher VaR", "moments", "shape", "tail")
+def _cornish_fisher_var(moments, shape, tail):
+    return cornish_fisher_quantile(tail, moments[0], np.sqrt(moments[1]), *shape)
+
+
+@metric("Cornish-Fisher CVaR", "moments", "shape", "tail", "returns")
+def _cornish_fisher_cvar(moments, shape, tail, returns):
+    """Mean of the expanded quantiles over the tail."""
+    levels = ((np.arange(100) + 0.5) / 100 * tail).reshape((-1,) + (1,) * (returns.ndim - 1))
+    return cornish_fisher_quantile(levels, moments[0], np.sqrt(moments[1]), *shape).mean(axis=0)
+
+
+@metric("Omega Ratio", "returns")
+def _omega(returns):
+    gains = np.maximum(returns, 0).sum(axis=0)
+    losses = -np.minimum(returns, 0).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(losses > 0, gains / losses, np.nan)
+
+
+@metric("Ulcer Index", "drawdown")
+def _ulcer_index(drawdown):
+    return np.sqrt((drawdown ** 2).sum(axis=0) / (drawdown.shape[0] - 1))
+
+
+@metric("Skew", "shape", "returns")
+def _skew(shape, returns):
+    n = returns.shape[0]
+    return np.sqrt(n * (n - 1)) / (n - 2) * shape[0]
+
+
+@metric("Kurtosis", "shape", "returns")
+def _kurtosis(shape, returns):
+    n = returns.shape[0]
+    return ((n + 1) * shape[1] + 6) * (n - 1) / ((n - 2) * (n - 3))
+
+
+@metric("Calmar Ratio", "Total Return", "Maximum Drawdown", "index")
+def _calmar(total_return, max_drawdown, index):
+    years = (index[-1] - index[0]).days / 252
+    cagr = np.abs(total_return + 1) ** (1 / years) - 1
+    return cagr / np.abs(max_drawdown)
+
+
+@metric("Beta", "period_returns", "benchmark_returns")
+def _beta(period_returns, bench):
+    bench_residual = bench - bench.mean(axis=0)
+    return (bench_residual * period_returns).mean(axis=0) / (bench_residual ** 2).mean(axis=0)
+
+
+@metric("Alpha", "period_returns", "benchmark_returns", "Beta", "rf", "periods")
+def _alpha(period_returns, bench, beta, rf, periods):
+    alpha_series = (period_returns - rf) - beta * (bench - rf)
+    return (1 + alpha_series.mean(axis=0)) ** periods - 1
+
+
+@metric("Tracking Error", "active", "periods")
+def _tracking_error(active, periods):
+    return active.std(axis=0, ddof=1) * periods ** 0.5
+
+
+@metric("Information Ratio", "active", "Tracking Error", "periods")
+def _information_ratio(active, tracking_error, periods):
+    return active.mean(axis=0) * periods / tracking_error
+
+
+@metric("Volatility", "returns", "periods")
+def _volatility(returns, periods):
+    return returns.std(axis=0, ddof=1) * periods ** 0.5
+
+
+@metric("Geometric Mean Return", "log_returns")
+def _geometric_mean_return(log_returns):
+    """Per-period compound growth rate."""
+    return np.expm1(log_returns.mean(axis=0))
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from app.covariance import Estimates
+
+
+OBJECTIVES = ("min_variance", "max_sharpe", "risk_parity", "target_volatility")
+
+# Sessions whose compiled problems are kept for warm starts.
+MAX_SESSIONS = int(os.getenv("OPTIMIZER_SESSIONS", 128))
+
+
+@dataclass
+class OptimizationResult:
+    weights: np.ndarray
+    status: str
+    solve_time: float       # seconds, including parameter updates
+    warm_started: bool
+
+
+class _Problem:
+    """A compiled, parametrised cvxpy problem for one objective and universe size.
+
+    Estimates and constraints are cvxpy Parameters, so re-solving only updates
+    parameter values: cvxpy reuses the canonicalisation (DPP) and solvers that
+    support it start from the previous primal/dual solution.
+    """
+
+    def __init__(self, objective: str, n_assets: int):
+        import cvxpy as cp
+
+        self.objective = objective
+        self.lock = threading.Lock()
+        self.solved = False
+        self.chol = cp.Parameter((n_assets, n_assets))          # cov = chol @ chol.T
+        self.mu = cp.Parameter(n_assets)
+        self.lower = cp.Parameter(n_assets, nonneg=True)
+        self.upper = cp.Parameter(n_assets, nonneg=True)
+        self.variance = cp.Parameter(nonneg=True)
+        self.budget = cp.Parameter(n_assets, pos=True)
+
+        w = cp.Variable(n_assets)
+        risk = cp.sum_squares(self.chol.T @ w)
+        if objective == "min_variance":
+            constraints = [cp.sum(w) == 1, w >= self.lower, w <= self.upper]
+            self.problem = cp.Problem(cp.Minimize(risk), constraints)
+        elif objective == "target_volatility":
+            constraints = [cp.sum(w) == 1, w >= self.lower, w <= self.upper, risk <= self.variance]
+            self.problem = cp.Problem(cp.Maximize(self.mu @ w), constraints)
+        elif objective == "max_sharpe":
+            # Homogenised form: y = kappa * w, so bounds scale with kappa.
+            kappa = cp.Variable(nonneg=True)
+            constraints = [self.mu @ w == 1, cp.sum(w) == kappa, w >= self.lower * kappa, w <= self.upper * kappa]
+            self.problem = cp.Problem(cp.Minimize(risk), constraints)
+        elif objective == "risk_parity":
+            # Spinu's convex formulation. w is only normalised afterwards, so the
+            # bounds are imposed homogeneously (relative to sum(w)); with binding
+            # bounds the risk contributions are as equal as the bounds allow.
+            total = cp.sum(w)
+            constraints = [w >= 1e-9, w >= self.lower * total, w <= self.upper * total]
+            self.problem = cp.Problem(cp.Minimize(0.5 * risk - self.budget @ cp.log(w)), constraints)
+        else:
+            raise ValueError(f"Unknown objective: {objective}")
+        self.w = w
+
+    def solve(self, estimates: Estimates, lower, upper, target_volatility=None, periods=52, risk_free_rate=0.0) -> OptimizationResult:
+        start = time.perf_counter()
+        cov = estimates.cov + 1e-10 * np.eye(len(estimates.mu))
+        self.chol.value = np.linalg.cholesky(cov)
+        mu = estimates.mu
+        if self.objective == "max_sharpe":
+            mu = mu - ((1 + risk_free_rate) ** (1 / periods) - 1)
+            if mu.max() <= 0:
+                raise ValueError("No asset has an expected return above the risk-free rate")
+        self.mu.value = mu
+        self.lower.value = np.asarray(lower, dtype=float)
+        self.upper.value = np.asarray(upper, dtype=float)
+        self.budget.value = np.full(len(estimates.mu), 1 / len(estimates.mu))
+        if self.objective == "target_volatility":
+            if target_volatility is None:
+                raise ValueError("target_volatility is required for the target_volatility objective")
+            self.variance.value = target_volatility ** 2 / periods
+
+        from cvxpy.error import SolverError
+
+        warm_started = self.solved
+        try:
+            self.problem.solve(warm_start=True)
+        except SolverError as e:
+            raise ValueError(f"Optimization failed: {e}")
+        if self.w.value is None:
+            raise ValueError(f"Optimization failed: {self.problem.status}")
+        self.solved = True
+
+        weights = np.maximum(self.w.value, 0)
+        weights = weights / weights.sum()
+        return OptimizationResult(
+            weights=weights,
+            status=self.problem.status,
+            solve_time=time.perf_counter() - start,
+            warm_started=warm_started,
+        )
+
+
+class Optimizer:
+    """Keeps one compiled problem per (session, objective, universe), LRU-bounded."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._problems: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _problem(self, session_id: Optional[str], objective: str, n_assets: int) -> _Problem:
+        if session_id is None:
+            return _Problem(objective, n_assets)
+        key = (session_id, objective, n_assets)
+        with self._lock:
+            if key not in self._problems:
+                self._problems[key] = _Problem(objective, n_assets)
+            self._problems.move_to_end(key)
+            while len(self._problems) > self.max_sessions:
+                self._problems.popitem(last=False)
+            return self._problems[key]
+
+    def optimize(
+        self,
+        estimates: Estimates,
+        objective: str,
+        session_id: Optional[str] = None,
+        lower=None,
+        upper=None,
+        target_volatility: Optional[float] = None,
+        periods: int = 52,
+        risk_free_rate: float = 0.0,
+    ) -> OptimizationResult:
+        """
+        Solves an allocation on the given estimates.
+
+        Args:
+            estimates (Estimates): Per-period mean and covariance of the universe.
+            objective (str): One of OBJECTIVES.
+            session_id (str): Reuse (and warm-start) the problem compiled for this session.
+            lower, upper (array-like): Per-asset weight bounds; default 0 and 1.
+            target_volatility (float): Annualised volatility cap for "target_volatility".
+            periods (int): Periods per year of the estimates.
+            risk_free_rate (float): Annual rate used by "max_sharpe".
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective: {objective}")
+        n_assets = len(estimates.mu)
+        lower = np.zeros(n_assets) if lower is None else np.asarray(lower, dtype=float)
+        upper = np.ones(n_assets) if upper is None else np.asarray(upper, dtype=float)
+        if np.any(lower > upper) or lower.sum() > 1 or upper.sum() < 1:
+            raise ValueError("Weight bounds are infeasible")
+
+        problem = self._problem(session_id, objective, n_assets)
+        with problem.lock:
+            return problem.solve(estimates, lower, upper, target_volatility, periods, risk_free_rate)
+
+
+optimizer = Optimizer()
@@ -0,0 +1,247 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+PRICE_STORE_PATH = os.getenv("PRICE_STORE_PATH", "./app/files/portfolio.pkl")
+
+# Storage/compute precision. float32 halves memory and doubles SIMD width for
+# large universes; see stats.compute_core_metrics for the error bounds.
+PRICE_DTYPE = np.dtype(os.getenv("PRICE_DTYPE", "float64"))
+
+# Seconds between checks of the snapshot file for a newer version.
+PRICE_STORE_CHECK_INTERVAL = float(os.getenv("PRICE_STORE_CHECK_INTERVAL", 5.0))
+
+# Calendar years kept before the most recent one (the backtest window).
+LOOKBACK_YEARS = 3
+
+DEFAULT_FREQ = "W"
+
+PERIODS_PER_YEAR = {"D": 252, "W": 52, "ME": 12}
+
+
+def hash_prices(prices: pd.DataFrame) -> str:
+    """Content hash of a price frame: index, columns and values."""
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(map(str, prices.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(prices, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class PriceStoreVersion:
+    """Immutable snapshot of the price store.
+
+    Every derived frame is cached on the version itself, so anything computed
+    from it stays valid for as long as the version is alive. Downstream caches
+    must include ``content_hash`` (see ``cache_key``) in their keys.
+    """
+
+    version_id: str
+    content_hash: str
+    prices: pd.DataFrame
+    created_at: datetime
+    parent_id: Optional[str] = None
+    _derived: Dict[tuple, object] = field(default_factory=dict, repr=False, compare=False)
+    _lock: threading.RLock = field(default_factory=threading.RLock, repr=False, compare=False)
+
+    def cache_key(self, *parts) -> tuple:
+        return (self.content_hash, *parts)
+
+    def _memo(self, key: tuple, build: Callable[[], object]):
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build()
+            return self._derived[key]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.prices.dtypes.iloc[0]
+
+    def frame(self, freq: str = DEFAULT_FREQ, lookback_years: int = LOOKBACK_YEARS, dtype=None) -> pd.DataFrame:
+        """Prices resampled to ``freq`` and cut to the backtest window."""
+        dtype = np.dtype(dtype or self.dtype)
+
+        def build():
+            if dtype != self.dtype:
+                return self.frame(freq, lookback_years).astype(dtype)
+            df = self.prices.resample(freq).last() if freq != "D" else self.prices
+            most_recent_year = df.index.max().year
+            return df[df.index.year >= most_recent_year - lookback_years]
+        return self._memo(("frame", freq, lookback_years, dtype.str), build)
+
+    def returns(self, freq: str = DEFAULT_FREQ, lookback_years: int = LOOKBACK_YEARS, dtype=None) -> pd.DataFrame:
+        """Simple returns over the backtest window.
+
+        Assets listed inside the window are held flat until their first quote,
+        so their returns are zero rather than NaN.
+        """
+        dtype = np.dtype(dtype or self.dtype)
+
+        def build():
+            prices = self.frame(freq, lookback_years, dtype).bfill()
+            return prices.pct_change().iloc[1:].fillna(0.0)
+        return self._memo(("returns", freq, lookback_years, dtype.str), build)
+
+
+class PriceStore:
+    """Publishes immutable, content-addressed price snapshots.
+
+    Readers pin a version with ``acquire()``; a refresh publishes a new current
+    version while pinned ones stay readable. ``current`` refreshes by itself
+    when the snapshot file changes, checking at most every ``check_interval``
+    seconds. Versions that are neither current
+    nor pinned are dropped by ``collect_garbage()``, which also notifies the
+    caches registered with ``on_collect()``.
+    """
+
+    def __init__(self, path: str = PRICE_STORE_PATH, dtype=PRICE_DTYPE, check_interval: float = PRICE_STORE_CHECK_INTERVAL):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._file_stamp: Optional[tuple] = None
+        self._next_check = 0.0
+        self._versions: Dict[str, PriceStoreVersion] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._refs: Counter = Counter()
+        self._current_id: Optional[str] = None
+        self._seq = 0
+        self._collect_callbacks: List[Callable[[PriceStoreVersion], None]] = []
+        self._publish_callbacks: List[Callable[[PriceStoreVersion], None]] = []
+
+    def publish(self, prices: pd.DataFrame, parent_id: Optional[str] = None) -> PriceStoreVersion:
+        prices = prices.sort_index().ffill().astype(self.dtype)
+        content_hash = hash_prices(prices)
+        with self._lock:
+            is_new = content_hash not in self._by_hash
+            if not is_new:
+                version = self._versions[self._by_hash[content_hash]]
+            else:
+                self._seq += 1
+                version = PriceStoreVersion(
+                    version_id=f"v{self._seq}-{content_hash[:12]}",
+                    content_hash=content_hash,
+                    prices=prices,
+                    created_at=datetime.now(timezone.utc),
+                    parent_id=parent_id if parent_id is not None else self._current_id,
+                )
+                self._versions[version.version_id] = version
+                self._by_hash[content_hash] = version.version_id
+            self._current_id = version.version_id
+        if is_new:
+            for callback in self._publish_callbacks:
+                callback(version)
+        self.collect_garbage()
+        return version
+
+    def _stat(self) -> tuple:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self) -> PriceStoreVersion:
+        """Reload the snapshot file and publish it if its content changed."""
+        stamp = self._stat()  # taken first, so a write during the load is seen by the next check
+        with open(self.path, "rb") as f:
+            version = self.publish(pickle.load(f))
+        self._file_stamp = stamp
+        return version
+
+    def _check_file(self) -> None:
+        """Refresh when the snapshot file changed since it was last loaded.
+
+        Only one thread reloads at a time; the others keep reading the current
+        version. A missing or half-written file keeps the current version and
+        is retried at the next check.
+        """
+        if self._current_id is not None and time.monotonic() < self._next_check:
+            return
+        # With a current version to fall back on, skip the check while another
+        # thread reloads instead of queueing behind it.
+        if not self._refresh_lock.acquire(blocking=self._current_id is None):
+            return
+        try:
+            if self._current_id is not None and time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                if self._current_id is None or self._stat() != self._file_stamp:
+                    self.refresh()
+            except Exception:
+                if self._current_id is None:
+                    raise
+        finally:
+            self._refresh_lock.release()
+
+    @property
+    def current(self) -> PriceStoreVersion:
+        self._check_file()
+        with self._lock:
+            return self._current()
+
+    def _current(self) -> PriceStoreVersion:
+        return self._versions[self._current_id]
+
+    def get(self, version_id: str) -> PriceStoreVersion:
+        with self._lock:
+            if version_id not in self._versions:
+                raise KeyError(f"Unknown or collected price store version: {version_id}")
+            return self._versions[version_id]
+
+    def versions(self) -> List[str]:
+        with self._lock:
+            return list(self._versions)
+
+    @contextmanager
+    def acquire(self, version_id: Optional[str] = None):
+        """Pin a version (the current one by default) for the duration of a request."""
+        if version_id is None:
+            # A reload (and its publish callbacks) runs outside the lock, so
+            # other readers keep pinning the current version meanwhile.
+            self._check_file()
+        with self._lock:
+            version = self.get(version_id) if version_id is not None else self._current()
+            self._refs[version.version_id] += 1
+        try:
+            yield version
+        finally:
+            with self._lock:
+                self._refs[version.version_id] -= 1
+                if self._refs[version.version_id] <= 0:
+                    del self._refs[version.version_id]
+            self.collect_garbage()
+
+    def on_publish(self, callback: Callable[[PriceStoreVersion], None]) -> None:
+        """Run ``callback`` for every newly published version (e.g. to precompute derived data)."""
+        self._publish_callbacks.append(callback)
+
+    def on_collect(self, callback: Callable[[PriceStoreVersion], None]) -> None:
+        self._collect_callbacks.append(callback)
+
+    def collect_garbage(self) -> List[str]:
+        with self._lock:
+            dead = [
+                self._versions.pop(version_id)
+                for version_id in list(self._versions)
+                if version_id != self._current_id and self._refs[version_id] == 0
+            ]
+            for version in dead:
+                del self._by_hash[version.content_hash]
+        for version in dead:
+            for callback in self._collect_callbacks:
+                callback(version)
+        return [version.version_id for version in dead]
+
+
+price_store = PriceStore()
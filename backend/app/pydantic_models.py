@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, Literal, Union, Dict, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, Literal, Union, Dict, List, Tuple
 from datetime import date, datetime, time
 from enum import Enum
 from fastapi import UploadFile
@@ -16,12 +16,151 @@ class StatRatio(BaseModel):
 class Asset(BaseModel):
     label: str
     weight: float
+    marginal_volatility: Optional[float] = None
+    volatility_share: Optional[float] = None
+    marginal_cvar: Optional[float] = None
+    cvar_share: Optional[float] = None
+
+class Sentiment(BaseModel):
+    sentiment: str
+    score: float
 
 class FinalResult(BaseModel):
     assets: List[Asset]
     stats1: List[dict]
     stats2: List[dict]
+    stats3: List[dict] = []
     time_serie: List[dict]
     risk_profile: str
     goal: str
     info: str
+    sentiment: Optional[Sentiment] = None
+    repairs: List[str] = []
+    provisional: bool = False
+
+
+class TradingCost(BaseModel):
+    bps: float = 0.0
+    spread: float = 0.0
+
+class BacktestRequest(BaseModel):
+    weights: List[float]
+    policy: Literal["buy_and_hold", "calendar", "threshold"] = "calendar"
+    frequency: Literal["monthly", "quarterly", "annual"] = "quarterly"
+    band: float = 0.05
+    costs: Optional[Dict[str, TradingCost]] = None
+    max_points: Optional[int] = Field(None, ge=3)
+
+class BacktestResponse(BaseModel):
+    time_serie: List[dict]
+    net_time_serie: Optional[List[dict]] = None
+    rebalances: int
+    turnover: Optional[float] = None
+    cost_drag: Optional[float] = None
+    version: str
+
+class SimulationRequest(BaseModel):
+    weights: List[float]
+    paths: int = Field(10000, gt=0, le=100_000)
+    horizon: int = Field(52, gt=0, le=520)
+    block: int = Field(1, gt=0, le=52)
+    seed: Optional[int] = None
+    target: Optional[float] = None
+
+class SimulationResponse(BaseModel):
+    fan_chart: List[dict]
+    hit_probability: Optional[float] = None
+    expected_value: float
+    version: str
+
+class WalkForwardRequest(BaseModel):
+    weights: List[float]
+    window: int = Field(252, ge=2)
+    step: int = Field(5, ge=1)
+    freq: Literal["D", "W"] = "D"
+    lookback_years: int = 10
+    policy: Literal["buy_and_hold", "calendar", "threshold"] = "calendar"
+    frequency: Literal["monthly", "quarterly", "annual"] = "quarterly"
+
+class WalkForwardResponse(BaseModel):
+    distribution: Dict[str, Dict[str, float]]
+    windows: List[dict]
+    version: str
+
+class StressRequest(BaseModel):
+    weights: List[float]
+
+class StressResponse(BaseModel):
+    scenarios: List[dict]
+    version: str
+
+class FrontierPoint(BaseModel):
+    risk: float
+    expected_return: float
+    weights: Dict[str, float]
+
+class FrontierResponse(BaseModel):
+    risk_measure: str
+    points: List[FrontierPoint]
+    version: str
+
+class FrontierNearestRequest(BaseModel):
+    target_risk: float
+    risk_measure: Literal["MV", "CVaR"] = "MV"
+
+class FrontierDistanceRequest(BaseModel):
+    weights: List[float]
+    risk_measure: Literal["MV", "CVaR"] = "MV"
+
+class FrontierDistanceResponse(BaseModel):
+    risk: float
+    expected_return: float
+    return_gap: float
+    risk_gap: float
+    nearest: FrontierPoint
+    version: str
+
+class OptimizationRequest(BaseModel):
+    objective: Literal["min_variance", "max_sharpe", "risk_parity", "target_volatility"] = "min_variance"
+    session_id: Optional[str] = None
+    min_weight: float = 0.0
+    max_weight: float = 1.0
+    bounds: Optional[Dict[str, Tuple[float, float]]] = None   # ticker -> (min, max) weight
+    target_volatility: Optional[float] = None
+    risk_free_rate: float = 0.02
+    covariance: Literal["sample", "ewma", "ledoit_wolf"] = "sample"
+
+class OptimizationResponse(BaseModel):
+    weights: Dict[str, float]
+    asset_weights: List[float]
+    expected_return: float
+    volatility: float
+    sharpe: float
+    status: str
+    solve_ms: float
+    warm_started: bool
+    version: str
+
+class VolatilityRequest(BaseModel):
+    weights: Optional[List[float]] = None
+    horizon: int = Field(1, ge=1, le=252)   # daily bars, up to a year
+
+class VolatilityResponse(BaseModel):
+    assets: Dict[str, float]
+    portfolio: Optional[float] = None
+    horizon: int
+    version: str
+
+class RollingRequest(BaseModel):
+    weights: List[float]
+    window: int = 63
+    freq: Literal["D", "W"] = "D"
+    lookback_years: int = 3
+    policy: Literal["buy_and_hold", "calendar", "threshold"] = "calendar"
+    frequency: Literal["monthly", "quarterly", "annual"] = "quarterly"
+    max_points: Optional[int] = Field(None, ge=3)
+
+class RollingResponse(BaseModel):
+    series: Dict[str, List[dict]]
+    window: int
+    version: str
@@ -0,0 +1,86 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from app.price_store import PriceStoreVersion, price_store
+
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 256))
+RESULT_CACHE_QUANTUM = float(os.getenv("RESULT_CACHE_QUANTUM", 1e-4))
+
+
+class ResultCache:
+    """Thread-safe LRU of fully built results keyed by store version and quantized weights.
+
+    Weights are rounded to multiples of ``quantum`` so allocations that differ
+    only by LLM noise share an entry; the store content hash in the key means
+    a price refresh can never serve stale numbers.
+    """
+
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE, quantum: float = RESULT_CACHE_QUANTUM):
+        self.maxsize = maxsize
+        self.quantum = quantum
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, version: PriceStoreVersion, weights, *extra) -> tuple:
+        quantized = np.rint(np.asarray(weights, dtype=float) / self.quantum).astype(np.int64)
+        return version.cache_key(quantized.shape, quantized.tobytes(), *extra)
+
+    def get(self, key: tuple) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_build(self, key: tuple, build: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def drop_version(self, version: PriceStoreVersion) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == version.content_hash]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "quantum": self.quantum,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+result_cache = ResultCache()
+price_store.on_collect(result_cache.drop_version)
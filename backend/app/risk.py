@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.frontier import CVAR_ALPHA
+
+
+@dataclass
+class RiskContributions:
+    """Euler decomposition of volatility and CVaR, one row per allocation.
+
+    ``weights * marginal`` sums over assets to the portfolio risk, so the
+    shares sum to 1.
+    """
+
+    volatility: np.ndarray            # (N,)
+    marginal_volatility: np.ndarray   # (N, K) d volatility / d weight
+    volatility_share: np.ndarray      # (N, K)
+    cvar: np.ndarray                  # (N,) expected loss beyond the VaR, per period
+    marginal_cvar: np.ndarray         # (N, K)
+    cvar_share: np.ndarray            # (N, K)
+
+
+def risk_contributions(weights, cov: np.ndarray, returns: np.ndarray, alpha: float = CVAR_ALPHA) -> RiskContributions:
+    """
+    Marginal and percentage contributions to volatility and historical CVaR.
+
+    Args:
+        weights (array-like): Allocations aligned with the assets, shape (K,) or (N, K).
+        cov (np.ndarray): Covariance of the asset returns, (K, K).
+        returns (np.ndarray): Historical asset returns, (T, K), for the CVaR.
+        alpha (float): CVaR tail probability.
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+    returns = np.asarray(returns, dtype=np.float64)
+
+    cov_weights = weights @ cov                                       # (N, K)
+    volatility = np.sqrt(np.einsum("nk,nk->n", cov_weights, weights))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        marginal_volatility = np.nan_to_num(cov_weights / volatility[:, None])
+
+    # Same tail as frontier.portfolio_risk; the marginal CVaR of an asset is
+    # its mean loss over the portfolio's tail scenarios.
+    losses = -(returns @ weights.T)                                   # (T, N)
+    tail = losses >= np.quantile(losses, 1 - alpha, axis=0)
+    counts = np.maximum(tail.sum(axis=0), 1)
+    marginal_cvar = -(tail.T @ returns) / counts[:, None]             # (N, K)
+    cvar = np.einsum("nk,nk->n", marginal_cvar, weights)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volatility_share = np.nan_to_num(weights * marginal_volatility / volatility[:, None])
+        cvar_share = np.nan_to_num(weights * marginal_cvar / cvar[:, None])
+    return RiskContributions(
+        volatility=volatility,
+        marginal_volatility=marginal_volatility,
+        volatility_share=volatility_share,
+        cvar=cvar,
+        marginal_cvar=marginal_cvar,
+        cvar_share=cvar_share,
+    )
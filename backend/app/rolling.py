@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def window_sums(x: np.ndarray, starts: np.ndarray, window: int) -> np.ndarray:
+    """Sums of x[s:s + window] along axis 0 for every s in ``starts``, O(1) each via prefix sums."""
+    prefix = np.concatenate([np.zeros((1,) + x.shape[1:]), np.cumsum(x, axis=0, dtype=np.float64)])
+    return prefix[starts + window] - prefix[starts]
+
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    """Trailing max over ``window`` rows (shorter at the start), O(T) with no Python loop.
+
+    Van Herk / Gil-Werman: cut the series into blocks of ``window`` rows. A
+    full window either is a prefix of one block or spans the suffix of one
+    block and a prefix of the next, so one prefix-max and one suffix-max
+    pass answer every window.
+    """
+    n = x.shape[0]
+    padded = np.concatenate([x, np.full((-n % window,) + x.shape[1:], -np.inf)])
+    blocks = padded.reshape((-1, window) + x.shape[1:])
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+
+    ends = np.arange(n)
+    starts = np.maximum(ends - window + 1, 0)
+    same_block = (starts // window == ends // window).reshape((-1,) + (1,) * (x.ndim - 1))
+    return np.where(same_block, prefix[ends], np.maximum(suffix[starts], prefix[ends]))
+
+
+@dataclass
+class WalkForwardResult:
+    starts: pd.DatetimeIndex
+    ends: pd.DatetimeIndex
+    total_return: np.ndarray     # (W, N) one row per window
+    volatility: np.ndarray
+    sharpe: np.ndarray
+    drawdown: np.ndarray         # drawdown at the window end from the window peak
+    max_drawdown: np.ndarray
+
+
+def walk_forward(values: pd.DataFrame, window: int, step: int, periods: int, rf: float = 0.0) -> WalkForwardResult:
+    """
+    Metrics of every ``window``-row window of a backtest, stepped by ``step`` rows.
+
+    Mean and volatility come from prefix sums of returns and squared returns,
+    and the end-of-window drawdown from an O(T) rolling max, so each window
+    costs O(1) whatever its length. Max drawdown inside each window is one
+    vectorised cumulative max over a strided view of the windows.
+
+    Args:
+        values (pd.DataFrame): Portfolio values, one column per allocation.
+        window (int): Window length in returns (e.g. 252 daily bars for a year).
+        step (int): Rows between consecutive window starts.
+        periods (int): Periods per year, for annualisation.
+        rf (float): Annual risk-free rate.
+    """
+    v = values.to_numpy(dtype=np.float64)
+    if v.ndim == 1:
+        v = v[:, None]
+    if window < 2 or window >= v.shape[0]:
+        raise ValueError(f"Window must be between 2 and {v.shape[0] - 1} periods, got {window}")
+    if step < 1:
+        raise ValueError(f"Step must be at least 1 period, got {step}")
+    returns = v[1:] / v[:-1] - 1
+    starts = np.arange(0, returns.shape[0] - window + 1, step)
+    ends = starts + window                                    # value rows closing each window
+
+    mean = window_sums(returns, starts, window) / window
+    sum_squares = window_sums(returns ** 2, starts, window)
+    variance = np.maximum(sum_squares - window * mean ** 2, 0) / (window - 1)
+    volatility = np.sqrt(variance * periods)
+    excess = mean - ((1 + rf) ** (1.0 / periods) - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = excess * periods / volatility
+
+    peak = rolling_max(v, window + 1)
+    drawdown = v[ends] / peak[ends] - 1
+
+    windows = sliding_window_view(v, window + 1, axis=0)[starts]   # (W, N, window + 1)
+    max_drawdown = (windows / np.maximum.accumulate(windows, axis=2) - 1).min(axis=2)
+
+    return WalkForwardResult(
+        starts=values.index[starts],
+        ends=values.index[ends],
+        total_return=v[ends] / v[starts] - 1,
+        volatility=volatility,
+        sharpe=sharpe,
+        drawdown=drawdown,
+        max_drawdown=max_drawdown,
+    )
+
+
+@dataclass
+class RollingMetrics:
+    index: pd.DatetimeIndex      # dates of the window ends
+    sharpe: np.ndarray           # (W, N)
+    volatility: np.ndarray
+    drawdown: np.ndarray         # from the peak of the trailing window
+    beta: Optional[np.ndarray] = None
+
+
+def rolling_metrics(values: pd.DataFrame, window: int, periods: int, rf: float = 0.0, benchmark=None) -> RollingMetrics:
+    """
+    Trailing-window Sharpe, volatility, drawdown and beta at every bar, in O(T).
+
+    Every statistic is a difference of prefix sums (returns, squared
+    returns and, for beta, benchmark cross products) and the drawdown peak
+    comes from ``rolling_max``, so the cost does not depend on the window.
+
+    Args:
+        values (pd.DataFrame): Portfolio values, one column per allocation.
+        window (int): Window length in returns.
+        periods (int): Periods per year, for annualisation.
+        rf (float): Annual risk-free rate.
+        benchmark (array-like): Benchmark returns aligned with the rows of
+            ``values`` (the first one is ignored); adds the rolling beta.
+    """
+    v = values.to_numpy(dtype=np.float64)
+    if v.ndim == 1:
+        v = v[:, None]
+    if window < 2 or window >= v.shape[0]:
+        raise ValueError(f"Window must be between 2 and {v.shape[0] - 1} periods, got {window}")
+    returns = v[1:] / v[:-1] - 1
+    starts = np.arange(returns.shape[0] - window + 1)
+    ends = starts + window
+
+    mean = window_sums(returns, starts, window) / window
+    variance = np.maximum(window_sums(returns ** 2, starts, window) - window * mean ** 2, 0) / (window - 1)
+    volatility = np.sqrt(variance * periods)
+    excess = mean - ((1 + rf) ** (1.0 / periods) - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = excess * periods / volatility
+
+    drawdown = v[ends] / rolling_max(v, window + 1)[ends] - 1
+
+    beta = None
+    if benchmark is not None:
+        bench = np.nan_to_num(np.asarray(benchmark, dtype=np.float64)[1:])[:, None]
+        bench_mean = window_sums(bench, starts, window) / window
+        bench_variance = window_sums(bench ** 2, starts, window) - window * bench_mean ** 2
+        covariance = window_sums(returns * bench, starts, window) - window * mean * bench_mean
+        with np.errstate(divide="ignore", invalid="ignore"):
+            beta = covariance / bench_variance
+
+    return RollingMetrics(
+        index=values.index[ends],
+        sharpe=sharpe,
+        volatility=volatility,
+        drawdown=drawdown,
+        beta=beta,
+    )
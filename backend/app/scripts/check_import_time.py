@@ -0,0 +1,80 @@
+"""Startup-time budget for the API process.
+
+Imports ``app.main`` in a fresh interpreter under ``python -X importtime`` and
+fails when the cumulative import time exceeds the budget, or when one of the
+heavy optional dependencies is imported eagerly (they must load on first use).
+
+Usage (from backend/):
+    python -m app.scripts.check_import_time [--budget SECONDS] [--top N]
+
+tests/test_import_time.py enforces the same checks in the test suite.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Seconds; generous enough for CI machines, tight enough to catch an eager heavy import.
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", 1.5))
+
+DEFERRED_MODULES = (
+    "quantstats",
+    "empyrical",
+    "riskfolio",
+    "cvxpy",
+    "arch",
+    "torch",
+    "transformers",
+    "google.genai",
+    "deepgram",
+    "scipy.stats",
+)
+
+
+def measure(module: str = "app.main") -> dict:
+    """Cumulative import time in microseconds of every module imported by ``module``."""
+    env = dict(os.environ, LLM_API_KEY=os.getenv("LLM_API_KEY", "unset"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET, help="seconds")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    timings = measure()
+    total = timings["app.main"] / 1e6
+    eager = [module for module in DEFERRED_MODULES if module in timings]
+
+    print(f"app.main imported in {total:.3f}s (budget {args.budget:.3f}s)")
+    for name, cumulative in sorted(timings.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {cumulative / 1e6:8.3f}s  {name}")
+
+    failed = False
+    if total > args.budget:
+        print(f"FAIL: import time over budget by {total - args.budget:.3f}s")
+        failed = True
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
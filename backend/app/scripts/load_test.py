@@ -0,0 +1,70 @@
+"""Offline load test of /gpt/send_text.
+
+Drives the full pipeline (parsing, backtest, stats, sentiment) through the
+ASGI app with the LLM replaced by the deterministic stub provider, so latency
+and throughput can be measured at realistic concurrency without network
+access or an API key.
+
+Usage (from backend/):
+    python -m app.scripts.load_test [--requests N] [--concurrency C] [--latency SPEC]
+
+SPEC is a stub latency distribution, e.g. ``lognormal:-0.5,0.4`` (see
+app.llm.latency_sampler).
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CLIENT_TEXTS = (
+    "I am 62 and will retire in three years, I cannot lose my pension savings.",
+    "I am young, I want long term growth and I am fine with some crypto exposure.",
+    "We are saving for a house in five years and want something balanced.",
+    "Hello",
+)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", default="lognormal:-0.5,0.4", help="stub latency distribution")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LLM_API_KEY", "unset")
+    from fastapi.testclient import TestClient
+
+    from app.llm import StubProvider, get_provider
+    from app.main import app
+
+    stub = StubProvider(latency=args.latency)
+    app.dependency_overrides[get_provider] = lambda: stub
+    client = TestClient(app)
+
+    def call(i):
+        start = time.perf_counter()
+        response = client.post("/gpt/send_text", params={"text": CLIENT_TEXTS[i % len(CLIENT_TEXTS)], "max_points": 500})
+        return response.status_code, time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(call, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [seconds for _, seconds in results]
+    errors = sum(code != 200 for code, _ in results)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, stub latency {args.latency}")
+    print(f"  throughput {args.requests / elapsed:.1f} req/s, errors {errors}")
+    for q in (0.5, 0.95, 0.99):
+        print(f"  p{int(q * 100):<3} {percentile(latencies, q) * 1000:8.1f} ms")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
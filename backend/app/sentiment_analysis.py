@@ -1,13 +1,38 @@
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
-import torch
-import torch.nn.functional as F
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
 
-# Load FinBERT Model and Tokenizer
 model_name = "ProsusAI/finbert"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name)
 
-def get_sentiment_score(text, chunk_size=400, stride=200):
+# Inference runs on its own pool so it never competes with request threads;
+# torch releases the GIL during the forward pass. Sized to the requests served
+# at once (40 is the threadpool FastAPI runs sync routes on), so a job never
+# queues behind another request's.
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", 40))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_model_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _load_model():
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    return tokenizer, model
+
+
+def load_model():
+    """Load FinBERT and its tokenizer on first use; torch and transformers are slow to import."""
+    with _model_lock:
+        return _load_model()
+
+def get_sentiment_score(text, chunk_size=400, stride=200, cancel: Optional[threading.Event] = None):
     """
     Analyzes sentiment of long text using a sliding window approach.
     
@@ -15,10 +40,17 @@ def get_sentiment_score(text, chunk_size=400, stride=200):
         text (str): Client's speech or transcript.
         chunk_size (int): Number of tokens per chunk (Max 512).
         stride (int): Overlapping tokens between chunks.
+        cancel (threading.Event): When set, stops before the next chunk
+            with CancelledError.
 
     Returns:
         dict: Sentiment label with average score across chunks.
     """
+    import torch
+    import torch.nn.functional as F
+
+    tokenizer, model = load_model()
+
     # Tokenize text into tokens
     tokens = tokenizer.encode(text, add_special_tokens=True)
     
@@ -36,11 +68,13 @@ def get_sentiment_score(text, chunk_size=400, stride=200):
     scores = []
 
     for i in range(0, len(tokens), stride):
+        if cancel is not None and cancel.is_set():
+            raise CancelledError()
         chunk = tokens[i:i + chunk_size]
         if len(chunk) < 10:  # Ignore very small fragments
             break
         inputs = tokenizer.decode(chunk, skip_special_tokens=True)
-        result = get_sentiment_score(inputs)  # Recursively analyze chunk
+        result = get_sentiment_score(inputs, cancel=cancel)  # Recursively analyze chunk
         sentiments.append(result["sentiment"])
         scores.append(result["score"])
 
@@ -51,6 +85,27 @@ def get_sentiment_score(text, chunk_size=400, stride=200):
     return {"sentiment": final_sentiment, "score": avg_score}
 
 
+def _timed_score(text, cancel):
+    if cancel.is_set():
+        raise CancelledError()
+    start = time.perf_counter()
+    result = get_sentiment_score(text, cancel=cancel)
+    return result, time.perf_counter() - start
+
+
+def submit_sentiment(text, cancel: threading.Event) -> Future:
+    """Score ``text`` on the sentiment pool; resolves to (result, seconds).
+
+    Setting ``cancel`` drops the job if it has not started and stops it
+    between chunks if it has.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SENTIMENT_WORKERS, thread_name_prefix="sentiment")
+    return _executor.submit(_timed_score, text, cancel)
+
+
 if __name__ == "__main__":
     client_text = "Your full transcript here..."
     result = get_sentiment_score(client_text)
@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Paths are simulated in chunks of about CHUNK_PATH_STEPS path-steps (and at
+# least MIN_CHUNK_PATHS paths), each from its own child seed. The split depends
+# on the request only, so a seed gives the same result on any machine.
+CHUNK_PATH_STEPS = 1_000_000
+MIN_CHUNK_PATHS = 5000
+
+# Jobs with more path-steps than this run their chunks on a process pool,
+# reduced in the workers.
+PARALLEL_THRESHOLD = int(os.getenv("SIMULATION_PARALLEL_THRESHOLD", 5_000_000))
+MAX_WORKERS = int(os.getenv("SIMULATION_WORKERS", os.cpu_count() or 1))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class SimulationResult:
+    percentiles: np.ndarray         # (len(levels), H, N) percentiles of cumulative growth
+    levels: Sequence[float]
+    hit_probability: Optional[np.ndarray] = None   # (N,) P(growth reaches target within H)
+    final_mean: Optional[np.ndarray] = None        # (N,) mean final growth
+
+
+def _sample_rows(rng: np.random.Generator, n_rows: int, paths: int, horizon: int, block: int) -> np.ndarray:
+    """Row indices of bootstrapped history, (paths, horizon); blocks wrap around the end."""
+    if block <= 1:
+        return rng.integers(0, n_rows, size=(paths, horizon))
+    n_blocks = -(-horizon // block)
+    starts = rng.integers(0, n_rows, size=(paths, n_blocks, 1))
+    rows = (starts + np.arange(block)) % n_rows
+    return rows.reshape(paths, -1)[:, :horizon]
+
+
+def _simulate_chunk(portfolio_returns, paths, horizon, block, seed, target):
+    rng = np.random.default_rng(seed)
+    rows = _sample_rows(rng, portfolio_returns.shape[0], paths, horizon, block)
+    growth = np.cumprod(1 + portfolio_returns[rows], axis=1)          # (paths, H, N)
+    hits = (growth >= target).any(axis=1).sum(axis=0) if target is not None else None
+    return growth, hits
+
+
+def _reduce_chunk(portfolio_returns, paths, horizon, block, seed, target, levels):
+    """``_simulate_chunk`` reduced in the worker: percentiles, hit count and final-growth sum."""
+    growth, hits = _simulate_chunk(portfolio_returns, paths, horizon, block, seed, target)
+    return np.percentile(growth, levels, axis=0), hits, growth[:, -1].sum(axis=0)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the API process is multithreaded.
+        _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _submit(*args):
+    global _executor
+    try:
+        return _get_executor().submit(_reduce_chunk, *args)
+    except BrokenProcessPool:
+        # A crashed worker poisons the pool; start a fresh one.
+        _executor = None
+        return _get_executor().submit(_reduce_chunk, *args)
+
+
+def simulate(
+    returns: np.ndarray,
+    weights,
+    paths: int = 10_000,
+    horizon: int = 52,
+    block: int = 1,
+    seed: Optional[int] = None,
+    target: Optional[float] = None,
+    levels: Sequence[float] = DEFAULT_PERCENTILES,
+) -> SimulationResult:
+    """
+    Monte Carlo forward simulation by (block) bootstrap of historical returns.
+
+    The allocation is rebalanced to ``weights`` every period, so the asset
+    return matrix is reduced to one return series per allocation before
+    sampling and the whole simulation is a gather plus a cumulative product.
+
+    Args:
+        returns (np.ndarray): Historical asset returns, shape (T, K).
+        weights (array-like): Weights aligned with the columns, shape (K,) or (N, K).
+        paths (int): Number of simulated paths P.
+        horizon (int): Number of periods H simulated forward.
+        block (int): Block length; 1 is the plain i.i.d. bootstrap.
+        seed (int): RNG seed; equal seeds give identical results.
+        target (float): Growth multiple (e.g. 1.2) whose hitting probability is reported.
+        levels (Sequence[float]): Percentiles of the fan chart.
+
+    Returns:
+        SimulationResult: Fan chart percentiles per horizon, hit probability and mean final growth.
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=returns.dtype))
+    portfolio_returns = returns @ weights.T                          # (T, N)
+
+    steps = horizon * weights.shape[0]
+    n_chunks = -(-paths // max(MIN_CHUNK_PATHS, CHUNK_PATH_STEPS // steps))
+    sizes = np.diff(np.linspace(0, paths, n_chunks + 1).astype(int))
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    jobs = [(portfolio_returns, int(size), horizon, block, child, target, levels) for size, child in zip(sizes, seeds)]
+    if n_chunks > 1 and MAX_WORKERS > 1 and paths * steps > PARALLEL_THRESHOLD:
+        chunks = [future.result() for future in [_submit(*job) for job in jobs]]
+    else:
+        chunks = [_reduce_chunk(*job) for job in jobs]
+    # Size-weighted mean of the chunk percentiles; exact for a single chunk.
+    # Chunks hold at least MIN_CHUNK_PATHS i.i.d. paths, which keeps it within
+    # 0.5% of the percentiles of all paths (see tests/test_simulation.py).
+    return SimulationResult(
+        percentiles=sum(chunk[0] * size for chunk, size in zip(chunks, sizes)) / paths,
+        levels=levels,
+        hit_probability=sum(chunk[1] for chunk in chunks) / paths if target is not None else None,
+        final_mean=sum(chunk[2] for chunk in chunks) / paths,
+    )
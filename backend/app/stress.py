@@ -0,0 +1,128 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.price_store import PriceStoreVersion, price_store
+
+
+# name -> (start, end) of the stress window, inclusive.
+SCENARIOS = {
+    "Q4 2018 selloff": ("2018-10-01", "2018-12-24"),
+    "COVID-19 crash 2020": ("2020-02-19", "2020-03-23"),
+    "Rate shock 2022": ("2022-01-03", "2022-10-14"),
+}
+
+_cache: Dict[tuple, "ScenarioSet"] = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class ScenarioSet:
+    """Price relatives of every scenario, stacked into one (R, K) matrix.
+
+    Each scenario block runs from its start to the end of history, so the same
+    rows give the stress window and the recovery after it.
+    """
+
+    names: List[str]
+    offsets: np.ndarray          # (S + 1,) block boundaries in ``relatives``
+    window_ends: np.ndarray      # (S,) last row of each stress window, relative to its block
+    dates: List[pd.DatetimeIndex]
+    relatives: np.ndarray
+
+
+def build_scenarios(version: PriceStoreVersion, scenarios: Dict[str, tuple] = SCENARIOS) -> ScenarioSet:
+    """Scenario price relatives for a store version, computed once per version."""
+    key = version.cache_key("stress", tuple(sorted(scenarios.items())))
+    with _lock:
+        if key in _cache:
+            return _cache[key]
+
+    prices = version.prices
+    names, blocks, ends, dates = [], [], [], []
+    for name, (start, end) in scenarios.items():
+        block = prices.loc[start:]
+        if block.empty or block.index[0] > pd.Timestamp(end):
+            continue
+        # Assets not listed at the start of the scenario are treated as cash.
+        relatives = (block / block.iloc[0]).fillna(1.0).to_numpy()
+        names.append(name)
+        blocks.append(relatives)
+        ends.append(block.index.searchsorted(pd.Timestamp(end), side="right") - 1)
+        dates.append(block.index)
+
+    scenario_set = ScenarioSet(
+        names=names,
+        offsets=np.concatenate([[0], np.cumsum([len(block) for block in blocks])]).astype(int),
+        window_ends=np.asarray(ends, dtype=int),
+        dates=dates,
+        relatives=np.concatenate(blocks) if blocks else np.empty((0, prices.shape[1])),
+    )
+    with _lock:
+        _cache[key] = scenario_set
+    return scenario_set
+
+
+def stress_test(weights, version: PriceStoreVersion = None, scenarios: Dict[str, tuple] = SCENARIOS) -> Dict[str, dict]:
+    """
+    Replays every scenario against one or a batch of buy-and-hold allocations.
+
+    Args:
+        weights (array-like): Weights aligned with the store columns, (K,) or (N, K).
+
+    Returns:
+        dict: Scenario name -> {"Return", "Maximum Drawdown", "Recovery Days"}, each an
+        (N,) array; Recovery Days is 0 without a drawdown and NaN if the
+        pre-scenario peak was not regained.
+    """
+    if version is None:
+        version = price_store.current
+    scenario_set = build_scenarios(version, scenarios)
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    weights = weights / weights.sum(axis=1, keepdims=True)
+
+    paths = scenario_set.relatives @ weights.T                  # (R, N), every scenario at once
+    results = {}
+    for i, name in enumerate(scenario_set.names):
+        path = paths[scenario_set.offsets[i]:scenario_set.offsets[i + 1]]
+        dates = scenario_set.dates[i]
+        end = scenario_set.window_ends[i]
+
+        window = path[:end + 1]
+        peaks = np.maximum.accumulate(window, axis=0)
+        underwater = window / peaks - 1
+        trough = underwater.argmin(axis=0)
+        columns = np.arange(path.shape[1])
+        peak_at_trough = peaks[trough, columns]
+
+        after = np.arange(path.shape[0])[:, None] > trough
+        recovered = after & (path >= peak_at_trough)
+        has_recovered = recovered.any(axis=0)
+        recovery_row = recovered.argmax(axis=0)
+        recovery_days = np.where(
+            has_recovered,
+            (dates[recovery_row] - dates[trough]).days.to_numpy(dtype=float),
+            np.nan,
+        )
+        max_drawdown = underwater.min(axis=0)
+        recovery_days[max_drawdown == 0] = 0
+        results[name] = {
+            "Start": dates[0],
+            "End": dates[end],
+            "Return": window[-1] - 1,
+            "Maximum Drawdown": max_drawdown,
+            "Recovery Days": recovery_days,
+        }
+    return results
+
+
+def _drop_version(version: PriceStoreVersion) -> None:
+    with _lock:
+        for key in [key for key in _cache if key[0] == version.content_hash]:
+            del _cache[key]
+
+
+price_store.on_collect(_drop_version)
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.metrics import MetricContext
+
+
+@dataclass
+class PerformanceTracker:
+    """Running performance of N portfolios, updated one price bar at a time in O(N).
+
+    State follows the batch conventions of app.metrics (the first bar has a
+    zero return, rf is de-annualised with ``periods``), so ``metrics()``
+    matches ``stats.compute_core_metrics`` on the full history up to
+    floating-point rounding (Welford's update is not bit-identical to a
+    two-pass mean). Plain arrays, so a tracker pickles for storage.
+    """
+
+    rf: float
+    periods: int
+    n: int
+    last_price: np.ndarray    # (N,)
+    wealth: np.ndarray        # growth of 1 since the first bar
+    peak: np.ndarray
+    max_drawdown: np.ndarray
+    mean: np.ndarray          # Welford mean of the returns
+    m2: np.ndarray            # Welford sum of squared deviations
+    downside: np.ndarray      # sum of squared negative excess returns
+
+    @property
+    def period_rf(self) -> float:
+        return (1 + self.rf) ** (1.0 / self.periods) - 1
+
+    @classmethod
+    def from_values(cls, values, rf: float = 0.0, periods: int = 252) -> "PerformanceTracker":
+        """Initialise from a price history, (T,) or (T, N), with the metric registry's intermediates."""
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+        context = MetricContext(values=values, rf=rf, periods=periods)
+        mean, m2 = context["moments"][:2]
+        wealth = context["wealth"]
+        return cls(
+            rf=rf,
+            periods=periods,
+            n=values.shape[0],
+            last_price=values[-1].copy(),
+            wealth=wealth[-1].copy(),
+            peak=wealth.max(axis=0),
+            max_drawdown=context["drawdown"].min(axis=0),
+            mean=mean,
+            m2=m2 * values.shape[0],
+            downside=(np.minimum(context["excess"], 0) ** 2).sum(axis=0),
+        )
+
+    def update(self, prices) -> None:
+        """Feed the next bar, one price per portfolio."""
+        prices = np.asarray(prices, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = prices / self.last_price - 1
+        returns[~np.isfinite(returns)] = 0
+        self.last_price = prices
+
+        self.wealth = self.wealth * (1 + returns)
+        self.peak = np.maximum(self.peak, self.wealth)
+        self.max_drawdown = np.minimum(self.max_drawdown, self.drawdown)
+
+        self.n += 1
+        delta = returns - self.mean
+        self.mean = self.mean + delta / self.n
+        self.m2 = self.m2 + delta * (returns - self.mean)
+        self.downside = self.downside + np.minimum(returns - self.period_rf, 0) ** 2
+
+    @property
+    def drawdown(self) -> np.ndarray:
+        return self.wealth / self.peak - 1
+
+    def metrics(self) -> dict:
+        """Current metrics, named as in the metric registry; arrays of shape (N,)."""
+        std = np.sqrt(self.m2 / (self.n - 1))
+        mean_excess = self.mean - self.period_rf
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sharpe = mean_excess / std * self.periods ** 0.5
+            sortino = mean_excess / np.sqrt(self.downside / self.n) * self.periods ** 0.5
+        return {
+            "Sharpe Ratio": sharpe,
+            "Sortino Ratio": sortino,
+            "Maximum Drawdown": self.max_drawdown,
+            "Total Return": self.wealth - 1,
+            "Volatility": std * self.periods ** 0.5,
+            "Drawdown": self.drawdown,
+        }
@@ -0,0 +1,46 @@
+import pytest
+
+from app.allocation_parser import AllocationParseError, parse_advice, parse_allocation, repair_allocation
+from app.api.routes.historical import asset_list
+
+LABELS = ["S&P 500", "Nasdaq 100", "US Bonds", "Gold"]
+
+
+def test_short_array_is_not_an_allocation():
+    with pytest.raises(AllocationParseError):
+        parse_allocation("Note [1] see [0.3,0.7]", LABELS)
+
+
+def test_short_arrays_are_skipped_for_a_later_allocation():
+    allocation = parse_allocation("Note [1]: weights [0.4, 0.3, 0.2, 0.1]", LABELS)
+    assert allocation.weights == pytest.approx([0.4, 0.3, 0.2, 0.1])
+    assert allocation.repairs == []
+
+
+def test_one_missing_trailing_weight_is_padded():
+    allocation = parse_allocation("[0.5, 0.3, 0.2]", LABELS)
+    assert allocation.weights == pytest.approx([0.5, 0.3, 0.2, 0.0])
+    assert allocation.repairs == ["padded the missing trailing weight with 0"]
+
+
+def test_short_array_in_schema_reply_is_rejected():
+    with pytest.raises(AllocationParseError):
+        repair_allocation([1.0], LABELS)
+    with pytest.raises(AllocationParseError):
+        parse_advice('{"summary": "x", "weights": [0.3, 0.7]}', LABELS)
+
+
+def test_percentage_strings_are_fractions_among_plain_weights():
+    labels = [label for label, _ in asset_list]
+    tickers = [ticker for _, ticker in asset_list]
+    allocation = repair_allocation({"iShares Core S&P 500": 0.5, "GC=F": "30%", "cash liquidity": 0.2}, labels, tickers)
+    weights = dict(zip(labels, allocation.weights))
+    assert weights["iShares Core S&P 500"] == pytest.approx(0.5)
+    assert weights["Gold"] == pytest.approx(0.3)
+    assert weights["Cash Liquidity"] == pytest.approx(0.2)
+    assert "converted 1 percentage strings to fractions" in allocation.repairs
+
+
+def test_percentage_strings_in_text_reply():
+    allocation = parse_allocation('{"S&P 500": "40%", "Nasdaq 100": "30%", "US Bonds": "20%", "Gold": "10%"}', LABELS)
+    assert allocation.weights == pytest.approx([0.4, 0.3, 0.2, 0.1])
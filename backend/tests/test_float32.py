@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from app.api.routes.stats import compute_core_metrics
+from app.backtest import run_backtest
+from app.price_store import PriceStore
+
+# Unit roundoff of float32.
+U = 2.0 ** -24
+
+
+
+@pytest.fixture(scope="module")
+def prices():
+    # A private store: the shared one would start the GARCH and frontier
+    # precomputations registered on publish. Filled the way
+    # backtest_allocation fills assets listed inside the window.
+    return PriceStore().current.frame("D", dtype=np.float64).bfill()
+
+
+@pytest.fixture(scope="module")
+def weights(prices):
+    """A single asset, equal weights and random allocations over the price columns."""
+    k = prices.shape[1]
+    rng = np.random.default_rng(0)
+    return np.vstack([np.eye(k)[0], np.full(k, 1 / k), rng.dirichlet(np.ones(k), 3)])
+
+
+@pytest.mark.parametrize("policy", ["buy_and_hold", "calendar", "threshold"])
+def test_backtest_values_within_cumulative_bound(prices, weights, policy):
+    values64 = run_backtest(prices, weights, policy=policy).values
+    values32 = run_backtest(prices.astype(np.float32), weights, policy=policy).values
+
+    assert values32.dtype == np.float32
+    bound = (len(prices) + prices.shape[1] + 2) * U
+    assert np.max(np.abs(values32 / values64 - 1)) <= bound
+
+
+def test_core_metrics_within_documented_bounds(prices, weights):
+    values = run_backtest(prices, weights).values
+    n = len(values)
+    metrics64 = compute_core_metrics(values, prices.index)
+    metrics32 = compute_core_metrics(values.astype(np.float32), prices.index)
+    assert metrics32["Sharpe Ratio"].dtype == np.float32
+
+    for name in ("Total Return", "Maximum Drawdown"):
+        # Relative to the wealth level the error is (T + 2) * u.
+        wealth = metrics64[name] + 1
+        assert np.all(np.abs(metrics32[name] - metrics64[name]) <= (n + 2) * U * np.abs(wealth))
+
+    returns = values[1:] / values[:-1] - 1
+    # Error of the mean excess return relative to the mean, with a factor 2 of headroom.
+    mean_bound = 2 * n * U * np.abs(returns).mean(axis=0) / np.abs(returns.mean(axis=0))
+    for name in ("Sharpe Ratio", "Sortino Ratio"):
+        relative = np.abs(metrics32[name] / metrics64[name] - 1)
+        assert np.all(relative <= mean_bound), name
+    assert np.all(np.abs(metrics32["Calmar Ratio"] / metrics64["Calmar Ratio"] - 1) <= mean_bound + (n + 2) * U)
@@ -0,0 +1,27 @@
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.garch import GARCH_FREQ, GarchService
+from app.price_store import PriceStore
+
+
+def test_failed_fits_fall_back_to_the_sample_variance(monkeypatch):
+    version = PriceStore().current
+    service = GarchService()
+    submitted = []
+
+    def failing_submit(returns, starting_values):
+        future = Future()
+        future.set_exception(RuntimeError("did not converge"))
+        submitted.append(future)
+        return future
+
+    monkeypatch.setattr(service, "_submit", failing_submit)
+    assert service.forecast(version) is None
+    forecast = service.forecast(version)
+
+    returns = version.returns(GARCH_FREQ)
+    assert len(submitted) == returns.shape[1]
+    np.testing.assert_allclose(forecast.volatility, returns.std(ddof=0).to_numpy() * np.sqrt(forecast.periods), rtol=1e-6)
+    assert not any(fit.converged for fit in service.fits(version).values())
@@ -0,0 +1,26 @@
+import pytest
+
+from app.scripts.check_import_time import DEFERRED_MODULES, IMPORT_TIME_BUDGET, measure
+
+
+@pytest.fixture(scope="module")
+def timings():
+    """Cumulative import times of a fresh ``import app.main`` (microseconds).
+
+    Re-measured up to three times while over budget, keeping the fastest run,
+    so a briefly busy machine does not fail the check.
+    """
+    runs = [measure()]
+    while runs[-1]["app.main"] / 1e6 > IMPORT_TIME_BUDGET and len(runs) < 3:
+        runs.append(measure())
+    return min(runs, key=lambda run: run["app.main"])
+
+
+def test_app_imports_within_budget(timings):
+    seconds = timings["app.main"] / 1e6
+    assert seconds <= IMPORT_TIME_BUDGET, f"app.main imported in {seconds:.3f}s, budget {IMPORT_TIME_BUDGET:.3f}s"
+
+
+def test_heavy_modules_are_deferred(timings):
+    eager = [module for module in DEFERRED_MODULES if module in timings]
+    assert not eager, f"Imported eagerly: {', '.join(eager)}"
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from app.llm import LLM_HEDGE_MIN_SAMPLES, GeminiProvider, LatencyBudget, StubProvider
+
+
+def test_deadline_holds_when_recent_calls_were_slower():
+    budget = LatencyBudget(deadline=0.5, workers=4)
+    budget._latencies.extend([1.0] * LLM_HEDGE_MIN_SAMPLES)
+    assert budget.hedge_delay() == 1.0
+
+    start = time.monotonic()
+    reply = budget.generate(StubProvider(latency="fixed:1.0", reply="{}"), "prompt")
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.6
+    assert reply.text is None and reply.error == "no reply within 0.5s"
+
+
+def test_reply_within_deadline_is_kept():
+    budget = LatencyBudget(deadline=0.5, workers=4)
+    budget._latencies.extend([1.0] * LLM_HEDGE_MIN_SAMPLES)
+
+    reply = budget.generate(StubProvider(latency="fixed:0.1", reply="{}"), "prompt")
+
+    assert reply.text == "{}" and not reply.hedged
+
+
+class HungProvider:
+    """Blocks every call until ``release`` is set, like a backend that stopped answering."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def generate(self, prompt, schema=None):
+        self.release.wait(5)
+        return "{}"
+
+
+def test_abandoned_calls_do_not_take_first_call_workers():
+    budget = LatencyBudget(deadline=0.2, workers=1, hedge_workers=0, abandoned_workers=2)
+    hung, fast = HungProvider(), StubProvider(reply="{}")
+    try:
+        for _ in range(2):
+            assert budget.generate(hung, "prompt").text is None
+        assert budget.generate(fast, "prompt").text == "{}"
+
+        # Abandoned slots full: the next hung call keeps its first-call worker.
+        assert budget.generate(hung, "prompt").text is None
+        assert budget.generate(fast, "prompt").error == "no free LLM worker within 0.2s"
+    finally:
+        hung.release.set()
+    time.sleep(0.1)
+    assert budget.generate(fast, "prompt").text == "{}"
+
+
+def test_gemini_requests_have_a_timeout():
+    provider = GeminiProvider(api_key="unset", timeout=2.5)
+    assert provider.client._api_client._http_options.timeout == 2500
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.api.routes.stats import RISK_FREE_RATE, compute_core_metrics
+from app.benchmark import benchmark_returns
+from app.price_store import PriceStore
+
+
+@pytest.fixture(scope="module")
+def version():
+    return PriceStore().current
+
+
+@pytest.fixture(scope="module")
+def portfolio(version):
+    """Daily values of an equal-weight buy-and-hold portfolio."""
+    prices = version.frame("D", dtype=np.float64).bfill()
+    return pd.DataFrame({"portfolio_value": (prices / prices.iloc[0]).mean(axis=1)})
+
+
+def reference_metrics(portfolio_data, market_returns):
+    """The quantstats/empyrical calls the registry metrics replaced."""
+    import empyrical as ep
+    import quantstats as qs
+
+    # Assigned as a column, the first return is NaN again; quantstats reads it as 0.
+    portfolio_data["returns"] = portfolio_data["portfolio_value"].pct_change().dropna()
+    returns = portfolio_data["returns"]
+    return {
+        "Sharpe Ratio": qs.stats.sharpe(returns, rf=RISK_FREE_RATE),
+        "Sortino Ratio": qs.stats.sortino(returns, rf=RISK_FREE_RATE),
+        "Calmar Ratio": qs.stats.calmar(returns),
+        "Alpha": ep.alpha(returns, market_returns, risk_free=RISK_FREE_RATE),
+        "Maximum Drawdown": qs.stats.max_drawdown(returns),
+        "Total Return": qs.stats.comp(returns),
+    }
+
+
+def test_registry_matches_quantstats(version, portfolio):
+    market = benchmark_returns(portfolio.index, version, "D")
+    expected = reference_metrics(portfolio.copy(), market)
+    metrics = compute_core_metrics(
+        portfolio["portfolio_value"].to_numpy(), portfolio.index, benchmark=market.to_numpy(), names=list(expected)
+    )
+    for name, value in expected.items():
+        assert float(metrics[name]) == pytest.approx(float(value), rel=1e-6), name
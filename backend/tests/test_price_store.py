@@ -0,0 +1,46 @@
+import pickle
+import threading
+import time
+
+import pandas as pd
+
+from app.price_store import PriceStore
+
+
+def write_prices(path, scale):
+    prices = pd.DataFrame({"A": [1.0, 1.1, 1.2], "B": [2.0, 2.1, 2.2]}, index=pd.date_range("2024-01-01", periods=3)) * scale
+    with open(path, "wb") as f:
+        pickle.dump(prices, f)
+
+
+def test_acquire_does_not_wait_for_a_reload(tmp_path):
+    path = tmp_path / "prices.pkl"
+    write_prices(path, 1)
+    store = PriceStore(str(path), check_interval=0)
+    first = store.current
+
+    publishing = threading.Event()
+
+    def slow_callback(version):
+        publishing.set()
+        time.sleep(1.0)
+
+    store.on_publish(slow_callback)
+    write_prices(path, 2)
+
+    def pin():
+        with store.acquire():
+            pass
+
+    reload = threading.Thread(target=pin)
+    reload.start()
+    assert publishing.wait(5)
+
+    start = time.monotonic()
+    with store.acquire() as version:
+        waited = time.monotonic() - start
+    reload.join()
+
+    assert waited < 0.2
+    assert version.version_id in (first.version_id, store.current.version_id)
+    assert store.current.version_id != first.version_id
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("bounds", [{"GOVT": [0.1]}, {"GOVT": [0.3, 0.1]}, {"UNKNOWN": [0.0, 1.0]}])
+def test_optimize_rejects_bad_bounds(client, bounds):
+    response = client.post("/portfolio/optimize", json={"bounds": bounds})
+    assert response.status_code == 422
+
+
+def test_stress_rejects_too_many_weights(client):
+    response = client.post("/portfolio/stress", json={"weights": [0.01] * 30})
+    assert response.status_code == 422
+
+
+def test_simulate_rejects_too_many_weights(client):
+    response = client.post("/portfolio/simulate", json={"weights": [0.01] * 30})
+    assert response.status_code == 422
+
+
+def post_when_ready(client, url, json, timeout=60):
+    """POST, retrying while the route answers 503 (background precomputation running)."""
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.post(url, json=json)
+        if response.status_code != 503 or time.monotonic() > deadline:
+            return response
+        time.sleep(0.2)
+
+
+def test_frontier_distance_rejects_too_many_weights(client):
+    response = post_when_ready(client, "/portfolio/frontier/distance", {"weights": [0.01] * 30})
+    assert response.status_code == 422
+
+
+def test_volatility_rejects_too_many_weights(client):
+    response = post_when_ready(client, "/stats/volatility", {"weights": [0.01] * 30})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("horizon", [0, -1, 253])
+def test_volatility_rejects_out_of_range_horizon(client, horizon):
+    response = client.post("/stats/volatility", json={"horizon": horizon})
+    assert response.status_code == 422
@@ -0,0 +1,44 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from app import sentiment_analysis
+from app.api.routes.gpt import SENTIMENT_WAIT, collect_sentiment
+
+
+@pytest.fixture
+def slow_scorer(monkeypatch):
+    """Sentiment scoring that takes 0.2 s, on a fresh pool."""
+    def score(text, cancel=None):
+        time.sleep(0.2)
+        return {"sentiment": "neutral", "score": 0.5}
+
+    monkeypatch.setattr(sentiment_analysis, "get_sentiment_score", score)
+    monkeypatch.setattr(sentiment_analysis, "_executor", None)
+
+
+def test_unfinished_job_is_dropped_after_the_grace_period():
+    cancel = threading.Event()
+    job = Future()
+    start = time.perf_counter()
+    assert collect_sentiment(job, cancel, {}) is None
+    assert time.perf_counter() - start < SENTIMENT_WAIT + 0.1
+    assert cancel.is_set() and job.cancelled()
+
+
+def test_concurrent_requests_do_not_queue(slow_scorer):
+    start = time.perf_counter()
+    jobs = [sentiment_analysis.submit_sentiment(f"text {i}", threading.Event()) for i in range(4)]
+    for job in jobs:
+        job.result()
+    assert time.perf_counter() - start < 0.4
+
+
+def test_finished_job_is_returned(slow_scorer):
+    timings = {}
+    job = sentiment_analysis.submit_sentiment("text", threading.Event())
+    job.result()
+    sentiment = collect_sentiment(job, threading.Event(), timings)
+    assert sentiment.sentiment == "neutral" and timings["sentiment"] >= 0.2
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from app import simulation
+from app.simulation import DEFAULT_PERCENTILES, simulate
+
+WEIGHTS = np.full(4, 0.25)
+
+
+@pytest.fixture(scope="module")
+def returns():
+    return np.random.default_rng(1).normal(0.001, 0.02, (600, 4))
+
+
+def all_paths(returns, paths, horizon, seed):
+    """Every path ``simulate`` draws, regenerated chunk by chunk in-process."""
+    n_chunks = -(-paths // max(simulation.MIN_CHUNK_PATHS, simulation.CHUNK_PATH_STEPS // horizon))
+    sizes = np.diff(np.linspace(0, paths, n_chunks + 1).astype(int))
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    portfolio_returns = returns @ WEIGHTS[:, None]
+    return np.concatenate([
+        simulation._simulate_chunk(portfolio_returns, int(size), horizon, 1, child, None)[0]
+        for size, child in zip(sizes, seeds)
+    ])
+
+
+def test_same_seed_same_result_with_any_worker_count(returns, monkeypatch):
+    monkeypatch.setattr(simulation, "PARALLEL_THRESHOLD", 0)
+    results = []
+    for workers in (1, 2):
+        monkeypatch.setattr(simulation, "MAX_WORKERS", workers)
+        results.append(simulate(returns, WEIGHTS, paths=12000, horizon=520, seed=42, target=1.3))
+    assert np.array_equal(results[0].percentiles, results[1].percentiles)
+    assert np.array_equal(results[0].hit_probability, results[1].hit_probability)
+    assert np.array_equal(results[0].final_mean, results[1].final_mean)
+
+
+@pytest.mark.parametrize("paths, horizon", [(3000, 520), (12000, 520), (20000, 260)])
+def test_merged_percentiles_within_documented_error(returns, paths, horizon):
+    result = simulate(returns, WEIGHTS, paths=paths, horizon=horizon, seed=7)
+    exact = np.percentile(all_paths(returns, paths, horizon, 7), DEFAULT_PERCENTILES, axis=0)
+    assert np.abs(result.percentiles / exact - 1).max() <= 0.005
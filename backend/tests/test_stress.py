@@ -0,0 +1,23 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from app.price_store import PriceStore
+from app.stress import stress_test
+
+SCENARIO = {"Dip": ("2024-01-02", "2024-01-04")}
+
+
+def test_recovery_days_from_the_trough_and_zero_without_drawdown(tmp_path):
+    index = pd.date_range("2024-01-01", periods=6)
+    prices = pd.DataFrame({"CASH": 1.0, "RISKY": [1.0, 1.0, 0.8, 0.9, 1.0, 1.1]}, index=index)
+    path = tmp_path / "prices.pkl"
+    with open(path, "wb") as f:
+        pickle.dump(prices, f)
+    version = PriceStore(str(path)).current
+
+    result = stress_test(np.eye(2), version, SCENARIO)["Dip"]
+
+    np.testing.assert_allclose(result["Maximum Drawdown"], [0.0, -0.2])
+    np.testing.assert_array_equal(result["Recovery Days"], [0, 2])